@@ -8,5 +8,5 @@ def handle_order_created(sender, order, **kwargs):
     # Handle the order created signal
     # can be overridden to send confirmation email, update inventory, etc.
     print(
-        f"Order created with ID: {order.id} for Customer ID: {order.customer.id}"
+        f"Order created with ID: {order.id} for Customer ID: {order.customer_id}"
     )  # Example action
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from likes.models import LikedItem
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount likes from the table into the like count cache. "
+        "Run periodically, e.g. from cron, to correct any drift."
+    )
+
+    def handle(self, *args, **options):
+        total = LikedItem.objects.reconcile_like_counts()
+        self.stdout.write(self.style.SUCCESS(f"Recounted likes for {total} objects."))
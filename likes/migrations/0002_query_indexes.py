@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("likes", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="likeditem",
+            index=models.Index(
+                fields=["content_type", "object_id"], name="likes_likeditem_object_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:00
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def delete_duplicate_likes(apps, schema_editor):
+    # Keep the first like of each user for each object.
+    LikedItem = apps.get_model("likes", "LikedItem")
+    duplicates = (
+        LikedItem.objects.values("user", "content_type", "object_id")
+        .annotate(keep=Min("pk"), count=Count("pk"))
+        .filter(count__gt=1)
+    )
+    for group in duplicates.iterator():
+        LikedItem.objects.filter(
+            user=group["user"],
+            content_type=group["content_type"],
+            object_id=group["object_id"],
+        ).exclude(pk=group["keep"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("likes", "0002_query_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_likes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="likeditem",
+            constraint=models.UniqueConstraint(
+                fields=("user", "content_type", "object_id"),
+                name="likes_likeditem_unique_user_object",
+            ),
+        ),
+    ]
@@ -1,12 +1,148 @@
+from itertools import islice
+from time import time_ns
 from django.db import models
+from django.db.models import Count
 from django.contrib.auth.models import User
 from django.conf import settings
+from django.core.cache import cache
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 
+GENERATION_KEY = "likes:generation"
+
+
+def get_timeout():
+    return getattr(settings, "LIKES_COUNT_TIMEOUT", 3600)
+
+
+def _generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, time_ns(), timeout=None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def _count_key(generation, content_type_id, object_id):
+    return f"likes:count:{generation}:{content_type_id}:{object_id}"
+
+
+def adjust_like_count(content_type_id, object_id, delta):
+    """
+    Move a cached like count by ``delta``. A count that isn't cached is left
+    for the next read to load, and one a rolled back write has moved is
+    corrected when it expires or is reconciled.
+    """
+    key = _count_key(_generation(), content_type_id, object_id)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        pass
+
+
+class LikedItemManager(models.Manager):
+    def get_like_counts(self, obj_type, obj_ids):
+        """
+        Return {object_id: like count} for many objects of one type. Counts
+        come from the cache; the misses are loaded in one grouped query.
+        """
+        content_type = ContentType.objects.get_for_model(obj_type)
+        generation = _generation()
+        keys = {
+            _count_key(generation, content_type.pk, object_id): object_id
+            for object_id in obj_ids
+        }
+        cached = cache.get_many(list(keys))
+        counts = {keys[key]: count for key, count in cached.items()}
+
+        missing = [object_id for object_id in obj_ids if object_id not in counts]
+        if missing:
+            loaded = dict.fromkeys(missing, 0)
+            loaded.update(
+                self.filter(content_type=content_type, object_id__in=missing)
+                .values("object_id")
+                .annotate(count=Count("id"))
+                .values_list("object_id", "count")
+            )
+            cache.set_many(
+                {
+                    _count_key(generation, content_type.pk, object_id): count
+                    for object_id, count in loaded.items()
+                },
+                timeout=get_timeout(),
+            )
+            counts.update(loaded)
+        return counts
+
+    def get_liked_by(self, user, obj_type, obj_ids):
+        """Return the ids, among ``obj_ids``, of the objects ``user`` likes."""
+        if not user.is_authenticated:
+            return set()
+        content_type = ContentType.objects.get_for_model(obj_type)
+        return set(
+            self.filter(
+                user=user, content_type=content_type, object_id__in=obj_ids
+            ).values_list("object_id", flat=True)
+        )
+
+    def like(self, user, obj):
+        content_type = ContentType.objects.get_for_model(obj)
+        _, created = self.get_or_create(
+            user=user, content_type=content_type, object_id=obj.pk
+        )
+        return created
+
+    def unlike(self, user, obj):
+        content_type = ContentType.objects.get_for_model(obj)
+        deleted, _ = self.filter(
+            user=user, content_type=content_type, object_id=obj.pk
+        ).delete()
+        return bool(deleted)
+
+    def reconcile_like_counts(self, batch_size=1000):
+        """
+        Recount likes from the table into a fresh cache generation and switch
+        readers over to it, dropping any drifted count at once. Returns the
+        number of objects with likes.
+        """
+        generation = time_ns()
+        counts = (
+            self.values_list("content_type_id", "object_id")
+            .annotate(count=Count("id"))
+            .order_by()
+            .iterator(chunk_size=batch_size)
+        )
+        total = 0
+        while batch := list(islice(counts, batch_size)):
+            cache.set_many(
+                {
+                    _count_key(generation, content_type_id, object_id): count
+                    for content_type_id, object_id, count in batch
+                },
+                timeout=get_timeout(),
+            )
+            total += len(batch)
+        cache.set(GENERATION_KEY, generation, timeout=None)
+        return total
+
 
 class LikedItem(models.Model):
+    objects = LikedItemManager()
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
     object_id = models.PositiveIntegerField()
     content_object = GenericForeignKey()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["content_type", "object_id"],
+                name="likes_likeditem_object_idx",
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "content_type", "object_id"],
+                name="likes_likeditem_unique_user_object",
+            ),
+        ]
@@ -0,0 +1,14 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from likes.models import LikedItem, adjust_like_count
+
+
+@receiver(post_save, sender=LikedItem)
+def count_like(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        adjust_like_count(instance.content_type_id, instance.object_id, 1)
+
+
+@receiver(post_delete, sender=LikedItem)
+def count_unlike(sender, instance, **kwargs):
+    adjust_like_count(instance.content_type_id, instance.object_id, -1)
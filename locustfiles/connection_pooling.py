@@ -0,0 +1,65 @@
+"""
+Compares request latency with and without persistent or pooled database
+connections. Every request here skips the response cache (?include=likes
+responses are never cached), so each one needs a database connection.
+
+Serve the app from a WSGI server that reuses its worker threads, such as
+gunicorn; runserver starts a thread per request, so no connection outlives
+its request there. Run the same load against each connection mode and
+compare the summary line printed at the end of each run:
+
+    DB_CONN_MAX_AGE=0 gunicorn storefront.wsgi -w 4 --threads 8
+    locust -f locustfiles/connection_pooling.py --headless -u 200 -r 20 \
+        -t 2m -H http://127.0.0.1:8000 --label fresh
+
+    DB_CONN_MAX_AGE=60 gunicorn storefront.wsgi -w 4 --threads 8
+    locust ... --label persistent
+
+    DB_POOL=1 DB_POOL_MAX_SIZE=4 gunicorn storefront.wsgi -w 4 --threads 8
+    locust ... --label pooled
+"""
+
+from random import randint
+
+from locust import HttpUser, between, events, task
+
+
+@events.init_command_line_parser.add_listener
+def add_arguments(parser):
+    parser.add_argument(
+        "--label", default="run", help="Name of this run in the p99 summary."
+    )
+    parser.add_argument(
+        "--products", type=int, default=100, help="Highest product id to request."
+    )
+
+
+@events.quitting.add_listener
+def report_percentiles(environment, **kwargs):
+    total = environment.stats.total
+    if not total.num_requests:
+        return
+    print(
+        f"[{environment.parsed_options.label}] "
+        f"requests={total.num_requests} failures={total.num_failures} "
+        f"p50={total.get_response_time_percentile(0.5):.0f}ms "
+        f"p99={total.get_response_time_percentile(0.99):.0f}ms"
+    )
+
+
+class UncachedProductUser(HttpUser):
+    wait_time = between(0.1, 0.5)
+
+    @task(2)
+    def list_products(self):
+        self.client.get(
+            "/store/products/?include=likes", name="/store/products/?include=likes"
+        )
+
+    @task(5)
+    def view_product_details(self):
+        product_id = randint(1, self.environment.parsed_options.products)
+        self.client.get(
+            f"/store/products/{product_id}/?include=likes",
+            name="/store/products/<product_id>/?include=likes",
+        )
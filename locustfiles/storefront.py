@@ -0,0 +1,251 @@
+"""
+Load test of the whole shopping funnel: anonymous browsing with filters and
+search, product details, carts, JWT login, checkout and order history.
+
+Seed the catalog and shopper accounts first; the same seed always produces
+the same data, so runs against different releases are comparable:
+
+    python manage.py seed_load_test --seed 1 --products 1000 --users 100
+
+Then run headless, saving a per-endpoint baseline and diffing it against
+the one from the previous release:
+
+    locust -f locustfiles/storefront.py --headless -u 100 -r 10 -t 5m \\
+        -H http://127.0.0.1:8000 \\
+        --baseline-out locustfiles/baselines/next.json \\
+        --baseline locustfiles/baselines/current.json
+
+Task and user weights can be changed per run with --weights (or the
+LOCUST_WEIGHTS environment variable), e.g. --weights checkout=0,search=5.
+"""
+
+import json
+from random import choice, randint, sample
+
+from locust import HttpUser, between, events
+
+# Relative frequency of each task, and of each kind of user.
+DEFAULT_WEIGHTS = {
+    "browser": 3,
+    "shopper": 1,
+    "list": 4,
+    "filter": 2,
+    "search": 2,
+    "detail": 6,
+    "add_to_cart": 3,
+    "view_cart": 2,
+    "checkout": 1,
+    "orders": 1,
+}
+
+dataset = {}
+
+
+@events.init_command_line_parser.add_listener
+def add_arguments(parser):
+    parser.add_argument(
+        "--dataset",
+        default="locustfiles/dataset.json",
+        help="Manifest written by `manage.py seed_load_test`.",
+    )
+    parser.add_argument(
+        "--weights",
+        default="",
+        env_var="LOCUST_WEIGHTS",
+        help="Comma separated name=weight overrides, e.g. checkout=0,search=5.",
+    )
+    parser.add_argument(
+        "--baseline-out", default="", help="Write this run's baseline here."
+    )
+    parser.add_argument(
+        "--baseline", default="", help="Baseline to compare this run against."
+    )
+
+
+def parse_weights(text):
+    weights = dict(DEFAULT_WEIGHTS)
+    for pair in filter(None, text.split(",")):
+        name, _, value = pair.partition("=")
+        if name.strip() not in weights:
+            raise ValueError(f"Unknown weight {name!r}; use {sorted(weights)}.")
+        weights[name.strip()] = int(value)
+    return weights
+
+
+def weighted(user_class, weights):
+    """Expand the user class's tasks into the list locust picks from."""
+    user_class.weight = weights[user_class.weight_name]
+    user_class.tasks = [
+        method
+        for name, method in user_class.funnel.items()
+        for _ in range(weights[name])
+    ]
+
+
+@events.init.add_listener
+def configure(environment, **kwargs):
+    options = environment.parsed_options
+    if options is None:
+        return
+    with open(options.dataset, encoding="utf-8") as file:
+        dataset.update(json.load(file))
+    weights = parse_weights(options.weights)
+    for user_class in (Browser, Shopper):
+        weighted(user_class, weights)
+
+
+def baseline(stats):
+    """Per-endpoint latency and throughput, keyed by method and name."""
+    return {
+        f"{entry.method} {entry.name}": {
+            "requests": entry.num_requests,
+            "failures": entry.num_failures,
+            "rps": round(entry.total_rps, 2),
+            "avg_ms": round(entry.avg_response_time, 1),
+            "p50_ms": entry.get_response_time_percentile(0.5),
+            "p95_ms": entry.get_response_time_percentile(0.95),
+            "p99_ms": entry.get_response_time_percentile(0.99),
+        }
+        for entry in sorted(stats.entries.values(), key=lambda e: (e.name, e.method))
+    }
+
+
+def compare(current, previous):
+    lines = []
+    for endpoint in sorted(current.keys() | previous.keys()):
+        now, before = current.get(endpoint), previous.get(endpoint)
+        if now is None or before is None:
+            lines.append(f"{endpoint}: {'removed' if now is None else 'new'}")
+            continue
+        changes = []
+        for metric in ("p50_ms", "p99_ms", "rps"):
+            if before[metric]:
+                change = (now[metric] - before[metric]) / before[metric] * 100
+                changes.append(
+                    f"{metric} {before[metric]} -> {now[metric]} ({change:+.0f}%)"
+                )
+        lines.append(f"{endpoint}: " + ", ".join(changes))
+    return lines
+
+
+@events.quitting.add_listener
+def write_baseline(environment, **kwargs):
+    options = environment.parsed_options
+    if options is None:
+        return
+    current = baseline(environment.stats)
+    if options.baseline_out:
+        with open(options.baseline_out, "w", encoding="utf-8") as file:
+            json.dump(current, file, indent=2, sort_keys=True)
+    if options.baseline:
+        with open(options.baseline, encoding="utf-8") as file:
+            previous = json.load(file)
+        for line in compare(current, previous):
+            print(line)
+
+
+class Browser(HttpUser):
+    """An anonymous visitor looking through the catalog."""
+
+    weight_name = "browser"
+    wait_time = between(1, 5)
+
+    def list_products(self):
+        # Keyset pages, following the next link as a shopper scrolling would.
+        response = self.client.get(
+            "/store/products/", params={"cursor": ""}, name="/store/products/"
+        )
+        for _ in range(randint(0, 2)):
+            if not response.ok or not response.json()["next"]:
+                break
+            response = self.client.get(
+                response.json()["next"], name="/store/products/?cursor"
+            )
+
+    def filter_products(self):
+        params = choice(
+            [
+                {"collection_id": choice(dataset["collection_ids"])},
+                {"tag": choice(dataset["tags"])},
+                {"unit_price__lt": randint(20, 200), "ordering": "-unit_price"},
+                {"ordering": "-average_rating"},
+            ]
+        )
+        self.client.get(
+            "/store/products/", params=params, name="/store/products/?filter"
+        )
+
+    def search_products(self):
+        self.client.get(
+            "/store/products/",
+            params={"search": choice(dataset["search_terms"])},
+            name="/store/products/?search",
+        )
+
+    def view_product(self):
+        product_id = choice(dataset["product_ids"])
+        self.client.get(f"/store/products/{product_id}/", name="/store/products/<id>/")
+
+    funnel = {
+        "list": list_products,
+        "filter": filter_products,
+        "search": search_products,
+        "detail": view_product,
+    }
+    tasks = list(funnel.values())
+
+
+class Shopper(Browser):
+    """A signed in customer who fills a cart, checks out and looks back."""
+
+    weight_name = "shopper"
+
+    def on_start(self):
+        response = self.client.post(
+            "/auth/jwt/create/",
+            json={
+                "username": choice(dataset["usernames"]),
+                "password": dataset["password"],
+            },
+            name="/auth/jwt/create/",
+        )
+        self.client.headers["Authorization"] = f"JWT {response.json()['access']}"
+        self.cart_id = None
+
+    def new_cart(self):
+        response = self.client.post("/store/carts/", name="/store/carts/")
+        self.cart_id = response.json()["id"]
+
+    def add_to_cart(self):
+        if self.cart_id is None:
+            self.new_cart()
+        for product_id in sample(dataset["product_ids"], randint(1, 3)):
+            self.client.post(
+                f"/store/carts/{self.cart_id}/items/",
+                json={"product_id": product_id, "quantity": randint(1, 3)},
+                name="/store/carts/<id>/items/",
+            )
+
+    def view_cart(self):
+        if self.cart_id is not None:
+            self.client.get(f"/store/carts/{self.cart_id}/", name="/store/carts/<id>/")
+
+    def checkout(self):
+        if self.cart_id is None:
+            return
+        self.client.post(
+            "/store/orders/", json={"cart_id": self.cart_id}, name="/store/orders/"
+        )
+        self.cart_id = None
+
+    def order_history(self):
+        self.client.get("/store/orders/", name="/store/orders/")
+
+    funnel = {
+        **Browser.funnel,
+        "add_to_cart": add_to_cart,
+        "view_cart": view_cart,
+        "checkout": checkout,
+        "orders": order_history,
+    }
+    tasks = list(funnel.values())
@@ -24,8 +24,11 @@ class ProductImageInline(admin.TabularInline):
 
     def thumbnail(self, instance):
         if instance.image:
+            url = instance.image.url
+            if "thumbnail" in instance.variants:
+                url = instance.image.storage.url(instance.variants["thumbnail"])
             return format_html(
-                '<img src="{}" style="width: 45px; height:45px;" />', instance.image.url
+                '<img src="{}" style="width: 45px; height:45px;" />', url
             )
 
         return ""
@@ -69,7 +72,7 @@ class CollectionAdmin(admin.ModelAdmin):
     list_display = ["title", "products_count"]
     search_fields = ["title"]
 
-    @admin.display(ordering="products_count")
+    @admin.display(ordering="product_count")
     def products_count(self, collection):
         url = (
             reverse("admin:store_product_changelist")
@@ -77,12 +80,9 @@ class CollectionAdmin(admin.ModelAdmin):
             + urlencode({"collection__id": str(collection.id)})
         )
         return format_html(
-            '<a href="{}">{} Products</a>', url, collection.products_count
+            '<a href="{}">{} Products</a>', url, collection.product_count
         )
 
-    def get_queryset(self, request):
-        return super().get_queryset(request).annotate(products_count=Count("products"))
-
 
 @admin.register(models.Customer)
 class CustomerAdmin(admin.ModelAdmin):
@@ -119,3 +119,11 @@ class OrderAdmin(admin.ModelAdmin):
     autocomplete_fields = ["customer"]
     inlines = [OrderItemInline]
     list_display = ["id", "placed_at", "customer"]
+
+
+@admin.register(models.OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ["id", "topic", "status", "attempts", "created_at", "available_at"]
+    list_filter = ["status", "topic"]
+    list_per_page = 50
+    readonly_fields = ["created_at", "processed_at"]
@@ -0,0 +1,197 @@
+from hashlib import sha256
+from time import time, time_ns
+from uuid import UUID
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+
+CATALOG = "catalog"
+PRODUCT = "product"
+COLLECTION = "collection"
+CART = "cart"
+
+
+def get_cache():
+    return caches[getattr(settings, "STORE_CACHE_ALIAS", "default")]
+
+
+def get_timeout():
+    return getattr(settings, "STORE_CACHE_TIMEOUT", 300)
+
+
+def get_version_timeout():
+    # Counters evicted or expired are re-seeded from the clock, so they only
+    # need to outlive the responses cached under them.
+    return getattr(
+        settings, "STORE_CACHE_VERSION_TIMEOUT", max(86400, 2 * get_timeout())
+    )
+
+
+def _version_key(scope, pk=None):
+    if pk is None:
+        return f"store:v:{scope}"
+    return f"store:v:{scope}:{pk}"
+
+
+def _modified_key(scope, pk=None):
+    return _version_key(scope, pk).replace("store:v:", "store:m:", 1)
+
+
+def get_versions(*scopes):
+    """
+    Return the current version of each ``(scope, pk)`` pair, in order.
+
+    A missing counter is seeded from the clock rather than from zero, so an
+    evicted counter can never roll back to a version that still has cached
+    responses under it.
+    """
+    cache = get_cache()
+    keys = [_version_key(*scope) for scope in scopes]
+    found = cache.get_many(keys)
+    missing = {key: time_ns() for key in keys if key not in found}
+    if missing:
+        for key, value in missing.items():
+            cache.add(key, value, timeout=get_version_timeout())
+        found.update(cache.get_many(list(missing)))
+    return [found[key] for key in keys]
+
+
+def get_modified(*scopes):
+    """
+    Return the time, in whole seconds, of the latest bump of any of the
+    given scopes. A missing stamp is seeded with the current time, which can
+    only make a client revalidate more often than it needs to.
+    """
+    cache = get_cache()
+    keys = [_modified_key(*scope) for scope in scopes]
+    found = cache.get_many(keys)
+    missing = {key: int(time()) for key in keys if key not in found}
+    if missing:
+        for key, value in missing.items():
+            cache.add(key, value, timeout=get_version_timeout())
+        found.update(cache.get_many(list(missing)))
+    return max(found[key] for key in keys)
+
+
+def _incr(scopes):
+    cache = get_cache()
+    timeout = get_version_timeout()
+    for scope in scopes:
+        key = _version_key(*scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time_ns(), timeout=timeout)
+    now = int(time())
+    cache.set_many({_modified_key(*scope): now for scope in scopes}, timeout=timeout)
+
+
+def bump(*scopes):
+    """
+    Invalidate every cached response built under the given scopes.
+
+    Inside a transaction the counters are bumped again on commit, so a read
+    that raced the write and cached the old rows is discarded as well.
+    """
+    _incr(scopes)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _incr(scopes))
+
+
+def bump_products(pairs):
+    """
+    Invalidate cached responses for products given as
+    ``(product_id, collection_id)`` pairs, along with their collections and
+    the unfiltered product list.
+    """
+    scopes = {(CATALOG,)}
+    for product_id, collection_id in pairs:
+        if product_id is not None:
+            scopes.add((PRODUCT, product_id))
+        if collection_id is not None:
+            scopes.add((COLLECTION, collection_id))
+    bump(*scopes)
+
+
+def bump_collections(collection_ids):
+    bump((CATALOG,), *((COLLECTION, pk) for pk in set(collection_ids)))
+
+
+def cart_scope(cart_id):
+    """The scope of a cart, whatever spelling of its UUID was given."""
+    return (CART, UUID(str(cart_id)).hex)
+
+
+def bump_cart(cart_id):
+    bump(cart_scope(cart_id))
+
+
+def _cart_products_key(scope):
+    return f"store:cart-products:{scope[1]}"
+
+
+def cart_scopes(cart_id):
+    """
+    The scopes a cart response depends on: the cart itself and the
+    products on it. Which products those are is remembered from the last
+    response built at the cart's current version; until one has been built,
+    any catalog change counts.
+    """
+    scope = cart_scope(cart_id)
+    (version,) = get_versions(scope)
+    known = get_cache().get(_cart_products_key(scope))
+    if known is None or known[0] != version:
+        return [scope, (CATALOG,)]
+    return [scope, *((PRODUCT, pk) for pk in known[1])]
+
+
+def remember_cart_products(cart_id, version, product_ids):
+    """Record the products on a cart as of ``version`` of its counter."""
+    scope = cart_scope(cart_id)
+    get_cache().set(
+        _cart_products_key(scope),
+        (version, sorted(product_ids)),
+        timeout=get_version_timeout(),
+    )
+
+
+def _forget(scopes):
+    keys = [_version_key(*scope) for scope in scopes]
+    keys += [_modified_key(*scope) for scope in scopes]
+    keys += [_cart_products_key(scope) for scope in scopes if scope[0] == CART]
+    get_cache().delete_many(keys)
+
+
+def forget_cart(cart_id):
+    """
+    Drop the counters of a deleted or checked out cart. A later read seeds
+    them again from the clock, which invalidates old responses just as a
+    bump would, and nothing is left behind for carts that are gone.
+    """
+    scope = cart_scope(cart_id)
+    _forget([scope])
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _forget([scope]))
+
+
+def response_key(request, *scopes):
+    versions = get_versions(*scopes)
+    url = request.build_absolute_uri(request.path)
+    params = sorted(request.query_params.lists())
+    raw = repr((url, params, versions)).encode("utf-8")
+    return "store:response:" + sha256(raw).hexdigest()
+
+
+def validators(request, *scopes):
+    """
+    Return ``(etag, last_modified)`` for a response built under ``scopes``
+    without building it. The ETag changes whenever any of the scopes is
+    bumped; ``last_modified`` is the latest bump as a Unix timestamp.
+    """
+    versions = get_versions(*scopes)
+    url = request.build_absolute_uri(request.path)
+    params = sorted(request.query_params.lists())
+    media_type = getattr(request, "accepted_media_type", "")
+    raw = repr((url, params, media_type, versions)).encode("utf-8")
+    return f'"{sha256(raw).hexdigest()[:32]}"', get_modified(*scopes)
@@ -0,0 +1,224 @@
+import logging
+import queue
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import images
+from .models import Order, OutboxEvent
+from .signals import order_created
+
+logger = logging.getLogger(__name__)
+
+ORDER_CREATED = "order_created"
+PRODUCT_IMAGE_UPLOADED = "product_image_uploaded"
+
+
+def _send_order_created(payload):
+    order = Order.objects.get(pk=payload["order_id"])
+    return order_created.send_robust(sender=Order, order=order)
+
+
+def _process_product_image(payload):
+    images.process_product_image(payload["image_id"])
+    return []
+
+
+HANDLERS = {
+    ORDER_CREATED: _send_order_created,
+    PRODUCT_IMAGE_UPLOADED: _process_product_image,
+}
+
+
+class LocalQueue:
+    """In-process stand-in for the Redis queue."""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+
+    def put(self, event_id):
+        self._queue.put(event_id)
+
+    def get(self, timeout):
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class RedisQueue:
+    def __init__(self, url, key="store:outbox"):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self._key = key
+
+    def put(self, event_id):
+        self._client.lpush(self._key, event_id)
+
+    def get(self, timeout):
+        item = self._client.brpop(self._key, timeout=max(int(timeout), 1))
+        if item is None:
+            return None
+        return int(item[1])
+
+
+_queue = None
+_pool = None
+_lock = threading.Lock()
+
+
+def get_queue():
+    global _queue
+    with _lock:
+        if _queue is None:
+            url = getattr(settings, "STORE_OUTBOX_QUEUE_URL", None)
+            _queue = RedisQueue(url) if url else LocalQueue()
+        return _queue
+
+
+def start_local_workers():
+    """
+    Start this process's worker pool when events go through the local
+    queue, where nobody else is listening. Called once the server has
+    loaded, so events left pending by a crash are swept on restart rather
+    than when the next one is published.
+    """
+    global _pool
+    workers = getattr(settings, "STORE_OUTBOX_WORKERS", 2)
+    event_queue = get_queue()
+    if not workers or not isinstance(event_queue, LocalQueue):
+        return None
+    with _lock:
+        if _pool is None:
+            _pool = WorkerPool(event_queue, workers)
+            _pool.start()
+        return _pool
+
+
+def publish(event_id):
+    try:
+        get_queue().put(event_id)
+    except Exception:
+        # The row is already committed; a worker sweep will pick it up.
+        logger.exception("Could not announce outbox event %s", event_id)
+
+
+def enqueue(topic, payload):
+    """
+    Record an event in the current transaction and announce it once the
+    transaction commits.
+    """
+    event = OutboxEvent.objects.create(topic=topic, payload=payload)
+    transaction.on_commit(lambda: publish(event.pk))
+    return event
+
+
+def dispatch(event_id):
+    """
+    Run the handlers for one due event. Returns True if the event was
+    handled, False if it was not due, already taken, or failed.
+
+    The event is claimed by pushing ``available_at`` out by a lease, a
+    conditional UPDATE only one worker can win. Handlers then run outside
+    any transaction, and a worker that dies mid-event leaves it to be
+    retried once the lease runs out.
+    """
+    max_attempts = getattr(settings, "STORE_OUTBOX_MAX_ATTEMPTS", 5)
+    retry_delay = getattr(settings, "STORE_OUTBOX_RETRY_DELAY", 30)
+    lease = getattr(settings, "STORE_OUTBOX_LEASE", 300)
+
+    now = timezone.now()
+    claimed = OutboxEvent.objects.filter(
+        pk=event_id, status=OutboxEvent.STATUS_PENDING, available_at__lte=now
+    ).update(available_at=now + timedelta(seconds=lease), attempts=F("attempts") + 1)
+    if not claimed:
+        return False
+    event = OutboxEvent.objects.get(pk=event_id)
+
+    try:
+        responses = HANDLERS[event.topic](event.payload)
+        errors = [
+            repr(response)
+            for _, response in responses
+            if isinstance(response, Exception)
+        ]
+    except Exception as error:
+        errors = [repr(error)]
+
+    if not errors:
+        event.status = OutboxEvent.STATUS_DONE
+        event.processed_at = timezone.now()
+        event.last_error = ""
+    else:
+        event.last_error = "\n".join(errors)
+        if event.attempts >= max_attempts:
+            event.status = OutboxEvent.STATUS_FAILED
+        else:
+            delay = retry_delay * 2 ** (event.attempts - 1)
+            event.available_at = timezone.now() + timedelta(seconds=delay)
+    event.save(update_fields=["status", "processed_at", "last_error", "available_at"])
+    return not errors
+
+
+def dispatch_due(limit=100):
+    """Handle pending events that are due, oldest first."""
+    ids = list(
+        OutboxEvent.objects.filter(
+            status=OutboxEvent.STATUS_PENDING, available_at__lte=timezone.now()
+        )
+        .order_by("available_at")
+        .values_list("pk", flat=True)[:limit]
+    )
+    return sum(dispatch(event_id) for event_id in ids)
+
+
+class WorkerPool:
+    """
+    Threads that take event ids off the queue and dispatch them, sweeping
+    the table for due events whenever the queue stays quiet for
+    ``poll_interval`` seconds. The sweep is what makes delivery durable: an
+    announcement lost to a crash or a queue outage only delays its event.
+    """
+
+    def __init__(self, event_queue, workers, poll_interval=None):
+        self.queue = event_queue
+        self.workers = workers
+        self.poll_interval = poll_interval or getattr(
+            settings, "STORE_OUTBOX_POLL_INTERVAL", 5
+        )
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for number in range(self.workers):
+            thread = threading.Thread(
+                target=self._run, name=f"outbox-worker-{number}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def join(self, timeout=None):
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                event_id = self.queue.get(self.poll_interval)
+                close_old_connections()
+                if event_id is None:
+                    dispatch_due()
+                else:
+                    dispatch(event_id)
+            except Exception:
+                logger.exception("Outbox worker failed")
+        connection.close()
@@ -0,0 +1,98 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum, Window
+
+from .models import OrderItem
+
+COLUMNS = [
+    "order_id",
+    "placed_at",
+    "payment_status",
+    "customer_id",
+    "order_total",
+    "item_id",
+    "product_id",
+    "product_title",
+    "quantity",
+    "unit_price",
+    "line_total",
+]
+
+
+def order_item_rows(orders, chunk_size=2000):
+    """
+    Yield one tuple per item of ``orders`` in ``COLUMNS`` order, grouped by
+    order, streamed from a server-side cursor where the database has one.
+    """
+    line_total = ExpressionWrapper(
+        F("quantity") * F("unit_price"),
+        output_field=DecimalField(max_digits=11, decimal_places=2),
+    )
+    order_total = Window(
+        Sum(line_total),
+        partition_by=[F("order_id")],
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+    return (
+        OrderItem.objects.filter(order__in=orders.values("pk"))
+        .annotate(line_total=line_total, order_total=order_total)
+        .order_by("order_id", "id")
+        .values_list(
+            "order_id",
+            "order__placed_at",
+            "order__payment_status",
+            "order__customer_id",
+            "order_total",
+            "id",
+            "product_id",
+            "product__title",
+            "quantity",
+            "unit_price",
+            "line_total",
+        )
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(COLUMNS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_ndjson(rows):
+    """Yield one JSON document per order, with its items nested."""
+    order = None
+    for row in rows:
+        record = dict(zip(COLUMNS, row))
+        if order is None or order["id"] != record["order_id"]:
+            if order is not None:
+                yield json.dumps(order, cls=DjangoJSONEncoder) + "\n"
+            order = {
+                "id": record["order_id"],
+                "placed_at": record["placed_at"],
+                "payment_status": record["payment_status"],
+                "customer_id": record["customer_id"],
+                "total": record["order_total"],
+                "items": [],
+            }
+        order["items"].append(
+            {
+                "id": record["item_id"],
+                "product_id": record["product_id"],
+                "product_title": record["product_title"],
+                "quantity": record["quantity"],
+                "unit_price": record["unit_price"],
+                "total": record["line_total"],
+            }
+        )
+    if order is not None:
+        yield json.dumps(order, cls=DjangoJSONEncoder) + "\n"
@@ -1,12 +1,56 @@
-from django_filters.rest_framework import FilterSet
+from django_filters.rest_framework import CharFilter, FilterSet
+from rest_framework.filters import OrderingFilter, SearchFilter
 
-from store.models import Product
+from store.models import Order, Product
+from store.search import search_products, tokenize
+from tags.models import TaggedItem
 
 
 class ProductFilter(FilterSet):
+    tag = CharFilter(method="filter_tag", label="Tag")
+
     class Meta:
         model = Product
         fields = {
             "collection_id": ["exact"],
             "unit_price": ["gt", "lt"],
+            "price_with_tax": ["gt", "lt"],
+        }
+
+    def filter_tag(self, queryset, name, value):
+        return queryset.filter(
+            pk__in=TaggedItem.objects.get_object_ids_for(Product, value)
+        )
+
+
+class OrderFilter(FilterSet):
+    class Meta:
+        model = Order
+        fields = {
+            "payment_status": ["exact"],
+            "placed_at": ["gte", "lte"],
         }
+
+
+class ProductSearchFilter(SearchFilter):
+    """
+    Serves ``?search=`` from the product search index and annotates each
+    match with ``search_rank``.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, "")
+        return search_products(queryset, text)
+
+
+class ProductOrderingFilter(OrderingFilter):
+    """
+    Orders search results by relevance unless the client asks for an
+    explicit ordering.
+    """
+
+    def get_default_ordering(self, view):
+        text = view.request.query_params.get(ProductSearchFilter.search_param, "")
+        if tokenize(text):
+            return ["-search_rank"]
+        return super().get_default_ordering(view)
@@ -0,0 +1,107 @@
+from hashlib import sha256
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from .models import ProductImage
+
+DEFAULT_VARIANTS = {
+    "thumbnail": {"size": [150, 150], "format": "JPEG"},
+    "medium": {"size": [600, 600], "format": "JPEG"},
+    "webp": {"size": [1200, 1200], "format": "WEBP"},
+}
+EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp"}
+
+
+def get_variant_specs():
+    return getattr(settings, "STORE_IMAGE_VARIANTS", DEFAULT_VARIANTS)
+
+
+def hash_file(file):
+    digest = sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def variant_path(content_hash, name, spec):
+    extension = EXTENSIONS.get(spec["format"], spec["format"].lower())
+    return f"store/variants/{content_hash[:2]}/{content_hash}/{name}.{extension}"
+
+
+def stored_original(content_hash):
+    """The stored file name of an earlier upload with the same content."""
+    return (
+        ProductImage.objects.filter(content_hash=content_hash)
+        .exclude(image="")
+        .values_list("image", flat=True)
+        .first()
+    )
+
+
+def known_variants(content_hash):
+    """
+    Variants already generated for an identical upload, so re-uploading
+    the same file doesn't compute them again.
+    """
+    for variants in ProductImage.objects.filter(content_hash=content_hash).values_list(
+        "variants", flat=True
+    ):
+        if set(variants) == set(get_variant_specs()):
+            return variants
+    return {}
+
+
+def render_variant(original, spec):
+    image = original.copy()
+    image.thumbnail(spec["size"], Image.Resampling.LANCZOS)
+    if spec["format"] == "JPEG" and image.mode != "RGB":
+        image = image.convert("RGB")
+    buffer = BytesIO()
+    image.save(buffer, format=spec["format"], quality=spec.get("quality", 85))
+    return buffer.getvalue()
+
+
+def generate_variants(image):
+    """
+    Write whichever variants of ``image`` are missing from storage and
+    return ``{name: path}`` for all of them. Paths are derived from the
+    content hash, so running this again, or for another upload of the same
+    file, finds the work already done.
+    """
+    storage = image.image.storage
+    specs = get_variant_specs()
+    paths = {
+        name: variant_path(image.content_hash, name, spec)
+        for name, spec in specs.items()
+    }
+    missing = [name for name, path in paths.items() if not storage.exists(path)]
+    if not missing:
+        return paths
+
+    with image.image.open("rb") as file:
+        original = ImageOps.exif_transpose(Image.open(file))
+        original.load()
+    for name in missing:
+        content = ContentFile(render_variant(original, specs[name]))
+        saved = storage.save(paths[name], content)
+        if saved != paths[name]:
+            # Another worker wrote the same variant first.
+            storage.delete(saved)
+    return paths
+
+
+def process_product_image(image_id):
+    image = ProductImage.objects.filter(pk=image_id).first()
+    if image is None or not image.image:
+        return
+    if not image.content_hash:
+        with image.image.open("rb") as file:
+            image.content_hash = hash_file(file)
+    variants = generate_variants(image)
+    ProductImage.objects.filter(pk=image.pk).update(
+        content_hash=image.content_hash, variants=variants
+    )
@@ -0,0 +1,166 @@
+import csv
+import json
+from collections import defaultdict
+from dataclasses import dataclass, field
+from itertools import islice
+from time import monotonic
+
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from .models import Collection, Product
+from .serializers import ProductImportSerializer
+
+FORMAT_CSV = "csv"
+FORMAT_NDJSON = "ndjson"
+UPDATE_FIELDS = ["title", "description", "unit_price", "inventory"]
+
+
+def decode_lines(lines):
+    """
+    Decode a stream of UTF-8 byte lines, dropping the byte order mark that
+    Excel's "CSV UTF-8" puts in front of the header.
+    """
+    for number, line in enumerate(lines):
+        text = line.decode("utf-8")
+        yield text.removeprefix("\ufeff") if number == 0 else text
+
+
+def read_csv(lines):
+    return csv.DictReader(lines)
+
+
+class InvalidRow:
+    """Stands in for a record the reader couldn't parse."""
+
+    def __init__(self, errors):
+        self.errors = errors
+
+
+def read_ndjson(lines):
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as error:
+            yield InvalidRow({"non_field_errors": [f"Invalid JSON: {error.msg}."]})
+
+
+READERS = {FORMAT_CSV: read_csv, FORMAT_NDJSON: read_ndjson}
+
+
+@dataclass
+class ImportReport:
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    errors: list = field(default_factory=list)
+    seconds: float = 0.0
+    dry_run: bool = False
+
+    @property
+    def rows(self):
+        return self.created + self.updated + self.unchanged + len(self.errors)
+
+    @property
+    def rows_per_second(self):
+        return round(self.rows / self.seconds) if self.seconds else self.rows
+
+    def as_dict(self, max_errors=100):
+        return {
+            "created": self.created,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "rejected": len(self.errors),
+            "errors": [
+                {"row": row, "errors": errors}
+                for row, errors in self.errors[:max_errors]
+            ],
+            "seconds": round(self.seconds, 3),
+            "rows_per_second": self.rows_per_second,
+            "dry_run": self.dry_run,
+        }
+
+
+def import_products(records, batch_size=1000, dry_run=False):
+    """
+    Upsert products from an iterable of dicts, matching existing products
+    by slug and collections by title, one batch at a time so memory stays
+    flat however long the input is.
+
+    Rows are validated with the same rules as the product API and invalid
+    ones are reported rather than aborting the import. With ``dry_run``
+    nothing is written but the report says what would have been.
+    """
+    report = ImportReport(dry_run=dry_run)
+    serializer = ProductImportSerializer()
+    collections = {}
+    started = monotonic()
+    records = enumerate(records, start=1)
+    while batch := list(islice(records, batch_size)):
+        _import_batch(batch, serializer, collections, report, dry_run)
+    report.seconds = monotonic() - started
+    return report
+
+
+def _import_batch(batch, serializer, collections, report, dry_run):
+    rows = {}
+    for number, record in batch:
+        if isinstance(record, InvalidRow):
+            report.errors.append((number, record.errors))
+            continue
+        # One serializer validates every row, the way many=True would, so
+        # its fields are only built once.
+        try:
+            data = serializer.run_validation(record)
+        except ValidationError as error:
+            report.errors.append((number, error.detail))
+            continue
+        # A slug repeated within the batch takes its last row.
+        rows[data["slug"]] = (number, data)
+
+    titles = {data["collection"] for _, data in rows.values()} - set(collections)
+    collections.update(
+        Collection.objects.filter(title__in=titles).values_list("title", "pk")
+    )
+    for slug, (number, data) in list(rows.items()):
+        if data["collection"] not in collections:
+            report.errors.append(
+                (number, {"collection": ["No collection with the given title."]})
+            )
+            del rows[slug]
+
+    existing = defaultdict(list)
+    for slug, pk, collection_id, *current in Product.objects.filter(
+        slug__in=rows
+    ).values_list("slug", "pk", "collection_id", *UPDATE_FIELDS):
+        existing[slug].append((pk, collection_id, current))
+
+    created, updated, moves = [], [], defaultdict(list)
+    for slug, (_, data) in rows.items():
+        collection_id = collections[data["collection"]]
+        values = {name: data.get(name) for name in UPDATE_FIELDS}
+        if slug not in existing:
+            created.append(Product(slug=slug, collection_id=collection_id, **values))
+            continue
+        for pk, current_collection_id, current in existing[slug]:
+            # Unchanged rows, the bulk of a routine sync, cost no writes.
+            if current != list(values.values()):
+                updated.append(Product(pk=pk, **values))
+            if current_collection_id != collection_id:
+                moves[collection_id].append(pk)
+
+    changed = {product.pk for product in updated}
+    changed.update(pk for ids in moves.values() for pk in ids)
+    report.created += len(created)
+    report.updated += len(changed)
+    report.unchanged += sum(len(existing[slug]) for slug in rows) - len(changed)
+    if dry_run:
+        return
+    with transaction.atomic():
+        Product.objects.bulk_create(created)
+        Product.objects.update_values(updated, UPDATE_FIELDS)
+        # One update per target collection keeps the product counts right.
+        for collection_id, ids in moves.items():
+            Product.objects.filter(pk__in=ids).update(collection_id=collection_id)
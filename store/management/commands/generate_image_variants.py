@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from store.images import process_product_image
+from store.models import ProductImage
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate missing variants for product images, e.g. for images "
+        "uploaded before variants existed or after STORE_IMAGE_VARIANTS changes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Check every image instead of only those without variants.",
+        )
+
+    def handle(self, *args, **options):
+        images = ProductImage.objects.order_by("pk")
+        if not options["all"]:
+            images = images.filter(variants={})
+        total = 0
+        for image_id in images.values_list("pk", flat=True).iterator():
+            process_product_image(image_id)
+            total += 1
+        self.stdout.write(self.style.SUCCESS(f"Processed {total} images."))
@@ -0,0 +1,70 @@
+import io
+import sys
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.imports import FORMAT_CSV, FORMAT_NDJSON, READERS, import_products
+
+
+class Command(BaseCommand):
+    help = (
+        "Create or update products by slug from a CSV or NDJSON file with "
+        "title, slug, description, unit_price, inventory and collection "
+        "(by title) columns."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import, or - for stdin.")
+        parser.add_argument(
+            "--format",
+            choices=sorted(READERS),
+            help="Input format; guessed from the file extension by default.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Validate and report without writing anything.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        format = options["format"]
+        if format is None:
+            suffix = Path(path).suffix.lower()
+            format = FORMAT_NDJSON if suffix in (".ndjson", ".jsonl") else FORMAT_CSV
+
+        if path == "-":
+            stdin = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8-sig", newline="")
+            report = self.run(stdin, format, options)
+        else:
+            try:
+                file = open(path, newline="", encoding="utf-8-sig")
+            except OSError as error:
+                raise CommandError(error)
+            with file:
+                report = self.run(file, format, options)
+
+        for row, errors in report.errors[:20]:
+            self.stderr.write(f"Row {row}: {errors}")
+        if len(report.errors) > 20:
+            self.stderr.write(f"... and {len(report.errors) - 20} more rejected rows.")
+        verb = "Would create" if report.dry_run else "Created"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {report.created}, updated {report.updated}, rejected "
+                f"{len(report.errors)} rows in {report.seconds:.1f}s "
+                f"({report.rows_per_second} rows/s); {report.unchanged} unchanged."
+            )
+        )
+
+    def run(self, file, format, options):
+        try:
+            return import_products(
+                READERS[format](file),
+                batch_size=options["batch_size"],
+                dry_run=options["dry_run"],
+            )
+        except UnicodeDecodeError as error:
+            raise CommandError(f"Input is not valid UTF-8: {error}")
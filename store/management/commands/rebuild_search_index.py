@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from store.models import Product
+from store.search import index_products
+
+
+class Command(BaseCommand):
+    help = "Rebuild the product search index from product titles and descriptions."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        products = Product.objects.only("title", "description").order_by("pk")
+        batch = []
+        total = 0
+        for product in products.iterator(chunk_size=batch_size):
+            batch.append(product)
+            if len(batch) == batch_size:
+                index_products(batch)
+                total += len(batch)
+                batch = []
+        index_products(batch)
+        total += len(batch)
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} products."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from store.models import Collection
+
+
+class Command(BaseCommand):
+    help = "Recount products per collection and fix any drifted product_count."
+
+    def handle(self, *args, **options):
+        fixed = Collection.objects.reconcile_product_counts()
+        self.stdout.write(self.style.SUCCESS(f"Corrected {fixed} collections."))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every product's price_with_tax and effective_price, e.g. "
+        "after changing STORE_DEFAULT_TAX_RATE or a promotion's discount."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        ids = Product.objects.order_by("pk").values_list("pk", flat=True)
+        batch = []
+        changed = 0
+        for pk in ids.iterator(chunk_size=batch_size):
+            batch.append(pk)
+            if len(batch) == batch_size:
+                changed += Product.objects.filter(pk__in=batch).reprice()
+                batch = []
+        changed += Product.objects.filter(pk__in=batch).reprice()
+        self.stdout.write(self.style.SUCCESS(f"Repriced {changed} products."))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from store.events import WorkerPool, dispatch_due, get_queue
+
+
+class Command(BaseCommand):
+    help = "Handle store outbox events from the queue until interrupted."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Handle the events that are due now and exit.",
+        )
+
+    def handle(self, *args, **options):
+        if options["once"]:
+            handled = dispatch_due()
+            self.stdout.write(self.style.SUCCESS(f"Handled {handled} events."))
+            return
+
+        pool = WorkerPool(get_queue(), options["workers"])
+        pool.start()
+        self.stdout.write(f"Started {options['workers']} outbox workers.")
+        try:
+            pool.join()
+        except KeyboardInterrupt:
+            pool.stop()
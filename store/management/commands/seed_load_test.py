@@ -0,0 +1,135 @@
+import json
+from decimal import Decimal
+from random import Random
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from store import cache
+from store.models import Collection, Customer, Order, OrderItem, Product, Promotion
+from tags.models import Tag, TaggedItem, bump_content_types
+
+PREFIX = "loadtest"
+COLORS = ["Black", "Blue", "Green", "Grey", "Navy", "Olive", "Red", "White"]
+MATERIALS = ["Cotton", "Denim", "Leather", "Linen", "Silk", "Wool"]
+ITEMS = ["Bag", "Cap", "Coat", "Dress", "Jacket", "Scarf", "Shirt", "Shoes"]
+TAGS = ["bestseller", "eco", "limited", "new", "sale", "summer", "winter"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Create a deterministic catalog and shopper accounts for the locust "
+        "suite and write a dataset manifest for it. The same seed and sizes "
+        "always produce the same data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--collections", type=int, default=10)
+        parser.add_argument("--products", type=int, default=1000)
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--password", default="loadtest-password")
+        parser.add_argument(
+            "--output",
+            default="locustfiles/dataset.json",
+            help="Where to write the manifest the locust suite reads.",
+        )
+        parser.add_argument(
+            "--flush",
+            action="store_true",
+            help="Delete data from a previous seeding, and its orders, first.",
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        if options["flush"]:
+            self.flush(User)
+        elif Product.objects.filter(slug__startswith=f"{PREFIX}-").exists():
+            raise CommandError("Load test data already exists; pass --flush.")
+
+        random = Random(options["seed"])
+        with transaction.atomic():
+            collections = Collection.objects.bulk_create(
+                Collection(title=f"{PREFIX} {MATERIALS[n % len(MATERIALS)]} {n}")
+                for n in range(options["collections"])
+            )
+            products = Product.objects.bulk_create(
+                self.build_products(random, collections, options["products"])
+            )
+            self.tag(random, products)
+            self.promote(random, products)
+            usernames = self.create_users(User, options["users"], options["password"])
+        cache.bump_products((product.pk, product.collection_id) for product in products)
+
+        manifest = {
+            "seed": options["seed"],
+            "collection_ids": [collection.pk for collection in collections],
+            "product_ids": [product.pk for product in products],
+            "search_terms": sorted({product.title.split()[-1] for product in products}),
+            "tags": TAGS,
+            "usernames": usernames,
+            "password": options["password"],
+        }
+        with open(options["output"], "w", encoding="utf-8") as file:
+            json.dump(manifest, file, indent=2)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Seeded {len(collections)} collections, {len(products)} products "
+                f"and {len(usernames)} users; manifest in {options['output']}."
+            )
+        )
+
+    def build_products(self, random, collections, count):
+        for n in range(count):
+            title = " ".join(
+                [random.choice(COLORS), random.choice(MATERIALS), random.choice(ITEMS)]
+            )
+            yield Product(
+                title=title,
+                slug=f"{PREFIX}-{n}",
+                description=f"{title} from the load test catalog.",
+                unit_price=Decimal(random.randint(500, 50000)) / 100,
+                # Enough stock that checkouts never run out mid-run.
+                inventory=1_000_000,
+                collection=random.choice(collections),
+            )
+
+    def tag(self, random, products):
+        tags = {label: Tag.objects.get_or_create(label=label)[0] for label in TAGS}
+        items = [
+            TaggedItem(tag=tags[label], content_object=product)
+            for product in products
+            for label in random.sample(TAGS, random.randint(0, 3))
+        ]
+        TaggedItem.objects.bulk_create(items)
+        bump_content_types({item.content_type_id for item in items})
+
+    def promote(self, random, products):
+        promotion = Promotion.objects.create(description=f"{PREFIX} sale", discount=0.2)
+        promotion.product_set.add(*random.sample(products, len(products) // 10))
+
+    def create_users(self, User, count, password):
+        # One hash for every account; hashing per user would dominate.
+        password = make_password(password)
+        users = User.objects.bulk_create(
+            User(
+                username=f"{PREFIX}{n}",
+                email=f"{PREFIX}{n}@example.com",
+                password=password,
+            )
+            for n in range(count)
+        )
+        Customer.objects.bulk_create(Customer(user=user) for user in users)
+        return [user.username for user in users]
+
+    def flush(self, User):
+        with transaction.atomic():
+            orders = Order.objects.filter(customer__user__username__startswith=PREFIX)
+            OrderItem.objects.filter(order__in=orders).delete()
+            orders.delete()
+            User.objects.filter(username__startswith=PREFIX).delete()
+            Product.objects.filter(slug__startswith=f"{PREFIX}-").delete()
+            Collection.objects.filter(title__startswith=f"{PREFIX} ").delete()
+            Promotion.objects.filter(description__startswith=PREFIX).delete()
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:29
+
+import django.db.models.deletion
+import store.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0005_alter_orderitem_order_productimage'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='productimage',
+            name='image',
+            field=models.ImageField(upload_to='store/images', validators=[store.validators.validate_file_size]),
+        ),
+        migrations.CreateModel(
+            name='ProductSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('W', 'Word'), ('T', 'Trigram')], max_length=1)),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.PositiveSmallIntegerField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='store.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'term'], name='store_searchterm_lookup_idx', opclasses=['varchar_pattern_ops', 'varchar_pattern_ops'])],
+                'unique_together': {('product', 'kind', 'term')},
+            },
+        ),
+    ]
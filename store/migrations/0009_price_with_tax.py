@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:46
+
+import django.core.validators
+from django.db import migrations, models
+
+from store.pricing import with_tax
+
+BATCH_SIZE = 500
+
+
+def price_products(apps, schema_editor):
+    Product = apps.get_model("store", "Product")
+    products = Product.objects.select_related("collection").order_by("pk")
+    batch = []
+    for product in products.iterator(chunk_size=BATCH_SIZE):
+        product.price_with_tax = with_tax(
+            product.unit_price, product.collection.tax_rate
+        )
+        batch.append(product)
+        if len(batch) == BATCH_SIZE:
+            Product.objects.bulk_update(batch, ["price_with_tax"])
+            batch = []
+    Product.objects.bulk_update(batch, ["price_with_tax"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0008_collection_product_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="collection",
+            name="tax_rate",
+            field=models.DecimalField(
+                blank=True,
+                decimal_places=4,
+                help_text="Leave empty to use the store's default rate.",
+                max_digits=5,
+                null=True,
+                validators=[django.core.validators.MinValueValidator(0)],
+            ),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="price_with_tax",
+            field=models.DecimalField(
+                db_index=True, decimal_places=2, default=0, editable=False, max_digits=8
+            ),
+        ),
+        migrations.RunPython(price_products, migrations.RunPython.noop),
+    ]
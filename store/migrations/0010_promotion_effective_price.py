@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:47
+
+import django.core.validators
+from django.db import migrations, models
+from django.db.models import Max
+
+from store.pricing import with_discount
+
+BATCH_SIZE = 500
+
+
+def price_products(apps, schema_editor):
+    Product = apps.get_model("store", "Product")
+    discounts = dict(
+        Product.promotions.through.objects.values("product_id")
+        .annotate(best=Max("promotion__discount"))
+        .values_list("product_id", "best")
+    )
+    products = Product.objects.only("unit_price").order_by("pk")
+    batch = []
+    for product in products.iterator(chunk_size=BATCH_SIZE):
+        product.effective_price = with_discount(
+            product.unit_price, discounts.get(product.pk)
+        )
+        batch.append(product)
+        if len(batch) == BATCH_SIZE:
+            Product.objects.bulk_update(batch, ["effective_price"])
+            batch = []
+    Product.objects.bulk_update(batch, ["effective_price"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0009_price_with_tax"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="effective_price",
+            field=models.DecimalField(
+                db_index=True, decimal_places=2, default=0, editable=False, max_digits=6
+            ),
+        ),
+        migrations.AddField(
+            model_name="promotion",
+            name="is_active",
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AlterField(
+            model_name="promotion",
+            name="discount",
+            field=models.FloatField(
+                help_text="Fraction taken off the unit price, e.g. 0.15 for 15% off.",
+                validators=[
+                    django.core.validators.MinValueValidator(0),
+                    django.core.validators.MaxValueValidator(1),
+                ],
+            ),
+        ),
+        migrations.RunPython(price_products, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0011_productimage_variants"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="customer",
+            options={
+                "ordering": ["id"],
+                "permissions": [("view_history", "Can view customer history")],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["customer", "placed_at", "id"], name="store_order_customer_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["placed_at", "id"], name="store_order_placed_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["unit_price", "id"], name="store_product_price_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["collection", "unit_price", "id"],
+                name="store_product_coll_price_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["last_update", "id"], name="store_product_updated_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations
+
+from store.search import index_products
+
+BATCH_SIZE = 500
+
+
+def index_existing_products(apps, schema_editor):
+    Product = apps.get_model("store", "Product")
+    ProductSearchTerm = apps.get_model("store", "ProductSearchTerm")
+    products = Product.objects.only("title", "description").order_by("pk")
+    batch = []
+    for product in products.iterator(chunk_size=BATCH_SIZE):
+        batch.append(product)
+        if len(batch) == BATCH_SIZE:
+            index_products(batch, ProductSearchTerm)
+            batch = []
+    index_products(batch, ProductSearchTerm)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0013_review_ratings"),
+    ]
+
+    operations = [
+        migrations.RunPython(index_existing_products, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0014_backfill_search_index"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="productimage",
+            name="content_hash",
+            field=models.CharField(
+                blank=True, db_index=True, editable=False, max_length=64
+            ),
+        ),
+    ]
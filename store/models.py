@@ -1,22 +1,381 @@
 from django.conf import settings
 from django.contrib import admin
-from django.core.validators import MinValueValidator
-from django.db import models
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import IntegrityError, connections, models, router, transaction
+from django.db.models import (
+    Case,
+    DecimalField,
+    Count,
+    ExpressionWrapper,
+    F,
+    Max,
+    OuterRef,
+    Prefetch,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.utils import timezone
+from collections import Counter
+from decimal import Decimal
 from uuid import uuid4
 
+from . import cache, pricing
 from .validators import validate_file_size
 
 
+class PromotionQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        pairs = list(
+            Product.objects.filter(promotions__in=self).values_list(
+                "id", "collection_id"
+            )
+        )
+        rows = super().update(**kwargs)
+        cache.bump_products(pairs)
+        if "discount" in kwargs or "is_active" in kwargs:
+            Product.objects.filter(pk__in=[pk for pk, _ in pairs]).reprice()
+        return rows
+
+
+class CollectionQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        ids = list(self.values_list("id", flat=True))
+        rows = super().update(**kwargs)
+        cache.bump_collections(ids)
+        if "tax_rate" in kwargs:
+            Product.objects.filter(collection_id__in=ids).reprice()
+        return rows
+
+    def adjust_product_counts(self, deltas):
+        """
+        Apply ``{collection_id: delta}`` to ``product_count`` in one UPDATE.
+        The arithmetic happens in the database, so concurrent writers don't
+        lose each other's changes.
+        """
+        deltas = {pk: delta for pk, delta in deltas.items() if pk and delta}
+        if not deltas:
+            return 0
+        change = Case(
+            *[When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()],
+            output_field=models.IntegerField(),
+        )
+        return self.filter(pk__in=deltas).update(
+            product_count=F("product_count") + change
+        )
+
+    def reconcile_product_counts(self):
+        """
+        Recount the products of every collection and fix the ones that
+        drifted. Returns the number of collections corrected.
+        """
+        actual = Subquery(
+            Product.objects.filter(collection=OuterRef("pk"))
+            .order_by()
+            .values("collection")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        return (
+            self.alias(actual=Coalesce(actual, 0))
+            .exclude(product_count=F("actual"))
+            .update(product_count=Coalesce(actual, 0))
+        )
+
+
+class InsufficientStock(Exception):
+    """
+    Raised by ``ProductQuerySet.reserve`` with ``available`` mapping each
+    short product id to the inventory it has left.
+    """
+
+    def __init__(self, available):
+        super().__init__(available)
+        self.available = available
+
+
+class ProductQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        return self._update(list(self.values_list("id", "collection_id")), **kwargs)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        rates = dict(
+            Collection.objects.filter(
+                pk__in={product.collection_id for product in objs}
+            ).values_list("pk", "tax_rate")
+        )
+        for product in objs:
+            product.price_with_tax = pricing.with_tax(
+                product.unit_price, rates.get(product.collection_id)
+            )
+            product.effective_price = pricing.with_discount(product.unit_price)
+        objs = super().bulk_create(objs, *args, **kwargs)
+        Collection.objects.adjust_product_counts(
+            Counter(product.collection_id for product in objs)
+        )
+        from .search import index_products
+
+        # Backends that don't return primary keys leave these to
+        # rebuild_search_index.
+        index_products(product for product in objs if product.pk is not None)
+        return objs
+
+    def best_discounts(self):
+        """
+        Map each of these products that has an active promotion to the
+        largest such discount, in one query over the promotion links.
+        """
+        links = Product.promotions.through.objects.filter(
+            product__in=self.values("pk"), promotion__is_active=True
+        )
+        return dict(
+            links.values("product_id")
+            .annotate(best=Max("promotion__discount"))
+            .values_list("product_id", "best")
+        )
+
+    def reprice(self):
+        """
+        Recompute the stored ``price_with_tax`` and ``effective_price`` of
+        these products from their unit price, their collection's tax rate
+        and their best active promotion. Returns the number of products
+        whose prices changed.
+        """
+        discounts = self.best_discounts()
+        rows = self.values_list(
+            "pk",
+            "unit_price",
+            "collection__tax_rate",
+            "price_with_tax",
+            "effective_price",
+        )
+        changed = []
+        for pk, unit_price, tax_rate, *current in rows:
+            prices = [
+                pricing.with_tax(unit_price, tax_rate),
+                pricing.with_discount(unit_price, discounts.get(pk)),
+            ]
+            if prices != current:
+                changed.append(
+                    Product(pk=pk, price_with_tax=prices[0], effective_price=prices[1])
+                )
+        Product.objects.update_values(changed, ["price_with_tax", "effective_price"])
+        return len(changed)
+
+    def adjust_ratings(self, count, total):
+        """
+        Add ``count`` ratings totalling ``total`` stars (either may be
+        negative) to the stored aggregates of these products and recompute
+        their average, all in one UPDATE so concurrent reviews can't lose
+        each other's changes.
+        """
+        rating_count = F("rating_count") + count
+        rating_sum = F("rating_sum") + total
+        average = Cast(
+            Cast(rating_sum, models.FloatField()) / NullIf(rating_count, 0),
+            DecimalField(max_digits=3, decimal_places=2),
+        )
+        return self.update(
+            rating_count=rating_count,
+            rating_sum=rating_sum,
+            average_rating=Coalesce(average, Value(Decimal(0))),
+        )
+
+    def reserve(self, quantities):
+        """
+        Take ``{product_id: quantity}`` out of inventory, all or nothing.
+
+        The rows are locked in primary key order so concurrent checkouts
+        sharing products queue up instead of deadlocking, and the decrement
+        itself is guarded by ``inventory >= quantity`` so stock never goes
+        negative even where row locks aren't available.
+        """
+        ids = sorted(quantities)
+        with transaction.atomic(savepoint=False):
+            rows = list(
+                self.select_for_update()
+                .filter(pk__in=ids)
+                .order_by("pk")
+                .values_list("pk", "collection_id", "inventory")
+            )
+            available = {pk: 0 for pk in ids}
+            available.update({pk: inventory for pk, _, inventory in rows})
+            short = {
+                pk: inventory
+                for pk, inventory in available.items()
+                if inventory < quantities[pk]
+            }
+            if short:
+                raise InsufficientStock(short)
+
+            decrement = Case(
+                *[When(pk=pk, then=Value(quantities[pk])) for pk in ids],
+                output_field=models.IntegerField(),
+            )
+            updated = (
+                self.filter(pk__in=ids)
+                .filter(inventory__gte=decrement)
+                ._update(
+                    [(pk, collection_id) for pk, collection_id, _ in rows],
+                    inventory=F("inventory") - decrement,
+                )
+            )
+            if updated != len(ids):
+                raise InsufficientStock(
+                    {
+                        pk: inventory
+                        for pk, inventory in self.filter(pk__in=ids).values_list(
+                            "pk", "inventory"
+                        )
+                        if inventory < quantities[pk]
+                    }
+                )
+
+    def update_values(self, products, fields, batch_size=500):
+        """
+        Write ``fields`` of each of ``products``, matched by primary key,
+        with one ``UPDATE ... FROM (VALUES ...)`` per batch. Unlike
+        ``bulk_update`` this doesn't build a CASE per field and row, which
+        dominates the cost of large batches. Collections can't be changed
+        this way; use ``update`` for moves.
+        """
+        products = list(products)
+        connection = connections[router.db_for_write(self.model)]
+        if connection.vendor not in ("postgresql", "sqlite"):
+            return self.bulk_update(products, fields, batch_size=batch_size)
+        if not products:
+            return 0
+
+        qn = connection.ops.quote_name
+        table = qn(self.model._meta.db_table)
+        columns = [self.model._meta.get_field(name) for name in fields]
+        assignments = ", ".join(
+            f"{qn(field.column)} = CAST(v.column{position} AS "
+            f"{field.db_type(connection)})"
+            for position, field in enumerate(columns, start=2)
+        )
+        row = "(" + ", ".join(["%s"] * (len(columns) + 1)) + ")"
+        pairs = list(
+            self.filter(pk__in=[product.pk for product in products]).values_list(
+                "id", "collection_id"
+            )
+        )
+        rows = 0
+        with transaction.atomic(using=connection.alias, savepoint=False):
+            with connection.cursor() as cursor:
+                for start in range(0, len(products), batch_size):
+                    batch = products[start : start + batch_size]
+                    params = []
+                    for product in batch:
+                        params.append(product.pk)
+                        params += [
+                            field.get_db_prep_save(
+                                getattr(product, field.attname), connection
+                            )
+                            for field in columns
+                        ]
+                    cursor.execute(
+                        f"UPDATE {table} SET {assignments} "
+                        f"FROM (VALUES {', '.join([row] * len(batch))}) AS v "
+                        f"WHERE {table}.{qn('id')} = v.column1",
+                        params,
+                    )
+                    rows += cursor.rowcount
+        self._updated(pairs, dict.fromkeys(fields))
+        return rows
+
+    def _update(self, pairs, **kwargs):
+        rows = super().update(**kwargs)
+        self._updated(pairs, kwargs)
+        return rows
+
+    def _updated(self, pairs, kwargs):
+        collection = kwargs.get("collection_id", kwargs.get("collection"))
+        if collection is not None:
+            collection_id = getattr(collection, "pk", collection)
+            deltas = Counter()
+            for _, previous in pairs:
+                if previous != collection_id:
+                    deltas[previous] -= 1
+                    deltas[collection_id] += 1
+            Collection.objects.adjust_product_counts(deltas)
+            pairs.append((None, collection_id))
+        cache.bump_products(pairs)
+        if "unit_price" in kwargs or collection is not None:
+            ids = [product_id for product_id, _ in pairs if product_id is not None]
+            Product.objects.filter(pk__in=ids).reprice()
+        if "title" in kwargs or "description" in kwargs:
+            from .search import index_products
+
+            ids = [product_id for product_id, _ in pairs if product_id is not None]
+            index_products(
+                Product.objects.filter(pk__in=ids).only("title", "description")
+            )
+
+
+class ProductImageQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        pairs = list(self.values_list("product_id", "product__collection_id"))
+        rows = super().update(**kwargs)
+        cache.bump_products(pairs)
+        return rows
+
+
 class Promotion(models.Model):
     description = models.CharField(max_length=255)
-    discount = models.FloatField()
+    discount = models.FloatField(
+        validators=[MinValueValidator(0), MaxValueValidator(1)],
+        help_text="Fraction taken off the unit price, e.g. 0.15 for 15% off.",
+    )
+    is_active = models.BooleanField(default=True)
+
+    objects = PromotionQuerySet.as_manager()
+
+
+class CounterFieldsMixin:
+    """
+    Leaves ``counter_fields`` out of saves that update a loaded row. They
+    are only moved with F() updates, which writing back the loaded values
+    would undo.
+    """
 
+    counter_fields = []
 
-class Collection(models.Model):
+    def save(self, *args, **kwargs):
+        if (
+            not self._state.adding
+            and not args
+            and kwargs.get("update_fields") is None
+            and not kwargs.get("force_insert")
+        ):
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class Collection(CounterFieldsMixin, models.Model):
     title = models.CharField(max_length=255)
     featured_product = models.ForeignKey(
         "Product", on_delete=models.SET_NULL, null=True, related_name="+", blank=True
     )
+    product_count = models.PositiveIntegerField(default=0, editable=False)
+    tax_rate = models.DecimalField(
+        max_digits=5,
+        decimal_places=4,
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(0)],
+        help_text="Leave empty to use the store's default rate.",
+    )
+
+    objects = CollectionQuerySet.as_manager()
+    counter_fields = ["product_count"]
 
     def __str__(self) -> str:
         return self.title
@@ -25,25 +384,54 @@ class Collection(models.Model):
         ordering = ["title"]
 
 
-class Product(models.Model):
+class Product(CounterFieldsMixin, models.Model):
     title = models.CharField(max_length=255)
     slug = models.SlugField()
     description = models.TextField(null=True, blank=True)
     unit_price = models.DecimalField(
         max_digits=6, decimal_places=2, validators=[MinValueValidator(1)]
     )
+    price_with_tax = models.DecimalField(
+        max_digits=8, decimal_places=2, default=0, editable=False, db_index=True
+    )
+    effective_price = models.DecimalField(
+        max_digits=6, decimal_places=2, default=0, editable=False, db_index=True
+    )
     inventory = models.IntegerField(validators=[MinValueValidator(0)])
     last_update = models.DateTimeField(auto_now=True)
     collection = models.ForeignKey(
         Collection, on_delete=models.PROTECT, related_name="products"
     )
     promotions = models.ManyToManyField(Promotion, blank=True)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    average_rating = models.DecimalField(
+        max_digits=3, decimal_places=2, default=0, editable=False
+    )
+
+    objects = ProductQuerySet.as_manager()
+    counter_fields = ["rating_count", "rating_sum", "average_rating"]
 
     def __str__(self) -> str:
         return self.title
 
     class Meta:
         ordering = ["title"]
+        # The product list orders by one of these with id as the tiebreaker,
+        # optionally within a collection.
+        indexes = [
+            models.Index(fields=["unit_price", "id"], name="store_product_price_idx"),
+            models.Index(
+                fields=["collection", "unit_price", "id"],
+                name="store_product_coll_price_idx",
+            ),
+            models.Index(
+                fields=["last_update", "id"], name="store_product_updated_idx"
+            ),
+            models.Index(
+                fields=["average_rating", "id"], name="store_product_rating_idx"
+            ),
+        ]
 
 
 class ProductImage(models.Model):
@@ -51,6 +439,38 @@ class ProductImage(models.Model):
         Product, on_delete=models.CASCADE, related_name="images"
     )
     image = models.ImageField(upload_to="store/images", validators=[validate_file_size])
+    content_hash = models.CharField(
+        max_length=64, blank=True, db_index=True, editable=False
+    )
+    variants = models.JSONField(default=dict, blank=True, editable=False)
+
+    objects = ProductImageQuerySet.as_manager()
+
+
+class ProductSearchTerm(models.Model):
+    KIND_WORD = "W"
+    KIND_TRIGRAM = "T"
+    KIND_CHOICES = [
+        (KIND_WORD, "Word"),
+        (KIND_TRIGRAM, "Trigram"),
+    ]
+
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="search_terms"
+    )
+    kind = models.CharField(max_length=1, choices=KIND_CHOICES)
+    term = models.CharField(max_length=64)
+    weight = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = [["product", "kind", "term"]]
+        indexes = [
+            models.Index(
+                fields=["kind", "term"],
+                name="store_searchterm_lookup_idx",
+                opclasses=["varchar_pattern_ops", "varchar_pattern_ops"],
+            ),
+        ]
 
 
 class Customer(models.Model):
@@ -82,7 +502,9 @@ class Customer(models.Model):
         return f"{self.user.first_name} {self.user.last_name}"
 
     class Meta:
-        ordering = ["user__first_name", "user__last_name"]
+        # Ordering by name would join auth_user on every query; the admin
+        # still sorts by name.
+        ordering = ["id"]
         permissions = [
             ("view_history", "Can view customer history"),
         ]
@@ -110,6 +532,14 @@ class Order(models.Model):
         permissions = [
             ("cancel_order", "Can cancel order"),
         ]
+        # Order history is listed newest first, per customer or for staff.
+        indexes = [
+            models.Index(
+                fields=["customer", "placed_at", "id"],
+                name="store_order_customer_idx",
+            ),
+            models.Index(fields=["placed_at", "id"], name="store_order_placed_idx"),
+        ]
 
 
 class OrderItem(models.Model):
@@ -127,24 +557,182 @@ class Address(models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
 
 
+class CartQuerySet(models.QuerySet):
+    def with_totals(self):
+        """
+        Annotate each cart with ``total_price`` and prefetch its items with
+        their line totals, all computed by the database.
+        """
+        total = Sum(
+            F("items__quantity") * F("items__product__effective_price"),
+            output_field=DecimalField(max_digits=14, decimal_places=2),
+        )
+        return self.annotate(
+            total_price=Coalesce(total, Value(Decimal(0)))
+        ).prefetch_related(Prefetch("items", queryset=CartItem.objects.with_totals()))
+
+
 class Cart(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
 
+    objects = CartQuerySet.as_manager()
+
+
+class CartItemManager(models.Manager):
+    def with_totals(self):
+        """
+        Load only the product columns a cart line renders, with the line
+        total computed as ``total_price``.
+        """
+        line_total = ExpressionWrapper(
+            F("quantity") * F("product__effective_price"),
+            output_field=DecimalField(max_digits=11, decimal_places=2),
+        )
+        return (
+            self.select_related("product")
+            .only(
+                "cart",
+                "product",
+                "quantity",
+                "product__title",
+                "product__unit_price",
+                "product__effective_price",
+            )
+            .annotate(total_price=line_total)
+        )
+
+    def add_quantities(self, cart_id, quantities):
+        """
+        Add ``{product_id: quantity}`` to the cart in one statement, creating
+        missing lines and incrementing existing ones in place.
+
+        Returns the resulting items. Products that don't exist are skipped,
+        so the caller can tell them apart without a separate lookup.
+        """
+        return self._write_quantities(cart_id, quantities, increment=True)
+
+    def set_quantities(self, cart_id, quantities):
+        """Like ``add_quantities`` but overwrites existing quantities."""
+        return self._write_quantities(cart_id, quantities, increment=False)
+
+    def _write_quantities(self, cart_id, quantities, increment):
+        if not quantities:
+            return []
+        connection = connections[router.db_for_write(self.model)]
+        if connection.vendor in ("postgresql", "sqlite"):
+            items = self._upsert(connection, cart_id, quantities, increment)
+        else:
+            items = self._update_or_create(cart_id, quantities, increment)
+        cache.bump_cart(cart_id)
+        return items
+
+    def _upsert(self, connection, cart_id, quantities, increment):
+        qn = connection.ops.quote_name
+        item_table = qn(self.model._meta.db_table)
+        product_table = qn(Product._meta.db_table)
+        cart_field = self.model._meta.get_field("cart")
+        values = ", ".join(["(%s, %s)"] * len(quantities))
+        quantity = "EXCLUDED.quantity"
+        if increment:
+            quantity = f"{item_table}.quantity + EXCLUDED.quantity"
+        sql = (
+            f"INSERT INTO {item_table} (cart_id, product_id, quantity) "
+            f"SELECT %s, p.id, v.column2 "
+            f"FROM (VALUES {values}) AS v "
+            f"JOIN {product_table} p ON p.id = v.column1 "
+            f"WHERE 1 = 1 "
+            f"ON CONFLICT (cart_id, product_id) "
+            f"DO UPDATE SET quantity = {quantity} "
+            f"RETURNING id, product_id, quantity"
+        )
+        params = [cart_field.get_db_prep_value(cart_id, connection)]
+        for product_id, quantity in quantities.items():
+            params += [product_id, quantity]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        return [
+            self.model(id=pk, cart_id=cart_id, product_id=product_id, quantity=quantity)
+            for pk, product_id, quantity in rows
+        ]
+
+    def _update_or_create(self, cart_id, quantities, increment):
+        existing = set(
+            Product.objects.filter(pk__in=quantities).values_list("pk", flat=True)
+        )
+        with transaction.atomic():
+            for product_id in existing:
+                quantity = quantities[product_id]
+                lines = self.filter(cart_id=cart_id, product_id=product_id)
+                new_quantity = F("quantity") + quantity if increment else quantity
+                if lines.update(quantity=new_quantity):
+                    continue
+                try:
+                    with transaction.atomic():
+                        self.create(
+                            cart_id=cart_id, product_id=product_id, quantity=quantity
+                        )
+                except IntegrityError:
+                    lines.update(quantity=new_quantity)
+            return list(self.filter(cart_id=cart_id, product_id__in=existing))
+
 
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name="items")
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveSmallIntegerField(validators=[MinValueValidator(1)])
 
+    objects = CartItemManager()
+
     class Meta:
         unique_together = [["cart", "product"]]
 
 
+class OutboxEvent(models.Model):
+    STATUS_PENDING = "P"
+    STATUS_DONE = "D"
+    STATUS_FAILED = "F"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    topic = models.CharField(max_length=255)
+    payload = models.JSONField()
+    status = models.CharField(
+        max_length=1, choices=STATUS_CHOICES, default=STATUS_PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    available_at = models.DateTimeField(default=timezone.now)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["status", "available_at"], name="store_outbox_due_idx"
+            ),
+        ]
+
+
 class Review(models.Model):
     product = models.ForeignKey(
         Product, on_delete=models.CASCADE, related_name="reviews"
     )
     name = models.CharField(max_length=255)
     description = models.TextField()
+    # Reviews written before ratings were collected have none.
+    rating = models.PositiveSmallIntegerField(
+        null=True, validators=[MinValueValidator(1), MaxValueValidator(5)]
+    )
     date = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["product", "date", "id"], name="store_review_product_idx"
+            ),
+        ]
@@ -0,0 +1,32 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+
+CENT = Decimal("0.01")
+
+
+def default_tax_rate():
+    return Decimal(str(getattr(settings, "STORE_DEFAULT_TAX_RATE", "0.20")))
+
+
+def with_tax(unit_price, tax_rate=None):
+    """
+    Price including tax, rounded half up to the cent. ``tax_rate`` is a
+    fraction such as ``Decimal("0.20")``; ``None`` means the default rate.
+    """
+    if tax_rate is None:
+        tax_rate = default_tax_rate()
+    price = Decimal(str(unit_price)) * (1 + Decimal(str(tax_rate)))
+    return price.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def with_discount(unit_price, discount=None):
+    """
+    Price after taking ``discount``, a fraction such as ``0.15`` for 15% off,
+    rounded half up to the cent. Discounts outside 0..1 are clamped.
+    """
+    price = Decimal(str(unit_price))
+    if not discount:
+        return price.quantize(CENT, rounding=ROUND_HALF_UP)
+    discount = min(max(Decimal(str(discount)), Decimal(0)), Decimal(1))
+    return (price * (1 - discount)).quantize(CENT, rounding=ROUND_HALF_UP)
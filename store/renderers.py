@@ -0,0 +1,38 @@
+import csv
+import io
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class CSVStreamRenderer(BaseRenderer):
+    """
+    Lets content negotiation pick CSV for views that stream their own body.
+    Only error responses are rendered here, as ``field,message`` rows.
+    """
+
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        items = data.items() if isinstance(data, dict) else [("detail", data)]
+        for field, message in items:
+            writer.writerow([field, message])
+        return buffer.getvalue().encode(self.charset)
+
+
+class NDJSONStreamRenderer(JSONRenderer):
+    """
+    Lets content negotiation pick NDJSON for views that stream their own body.
+    Only error responses are rendered here, as a single JSON line.
+    """
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(data, accepted_media_type, renderer_context) + b"\n"
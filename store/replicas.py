@@ -0,0 +1,155 @@
+from contextvars import ContextVar
+from random import choice
+from time import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.functional import SimpleLazyObject, empty
+from rest_framework.permissions import SAFE_METHODS
+
+from . import cache
+
+PIN_COOKIE = "store_primary"
+
+# Read-mostly catalog models whose reads may be served by a replica.
+DEFAULT_REPLICA_MODELS = [
+    "store.collection",
+    "store.product",
+    "store.productimage",
+    "store.promotion",
+    "store.review",
+    "tags.tag",
+    "tags.taggeditem",
+]
+
+_current_request = ContextVar("store_replica_request", default=None)
+
+
+def get_replicas():
+    return getattr(settings, "STORE_READ_REPLICAS", [])
+
+
+def get_replica_models():
+    return getattr(settings, "STORE_REPLICA_MODELS", DEFAULT_REPLICA_MODELS)
+
+
+def get_pin_seconds():
+    return getattr(settings, "STORE_REPLICA_PIN_SECONDS", 10)
+
+
+def _user_pin_key(user_id):
+    return f"store:pin:user:{user_id}"
+
+
+def _resolved_user(request):
+    """
+    The request's user if authentication has already run, without running
+    it from inside the router.
+    """
+    user = request.__dict__.get("user")
+    if isinstance(user, SimpleLazyObject) and user._wrapped is empty:
+        return None
+    return user
+
+
+def is_pinned(request):
+    """
+    Whether ``request`` comes from a client that wrote recently, and so must
+    read from the primary to see its own writes.
+    """
+    if request.COOKIES.get(PIN_COOKIE):
+        return True
+    user = _resolved_user(request)
+    if user is None or not user.is_authenticated:
+        return False
+    return cache.get_cache().get(_user_pin_key(user.pk)) is not None
+
+
+def pin(request, response):
+    """Keep the client that made ``request`` on the primary for a while."""
+    seconds = get_pin_seconds()
+    response.set_cookie(PIN_COOKIE, "1", max_age=seconds, httponly=True)
+    user = _resolved_user(request)
+    if user is not None and user.is_authenticated:
+        cache.get_cache().set(_user_pin_key(user.pk), 1, timeout=seconds)
+
+
+def uses_replica(request):
+    if request.method not in SAFE_METHODS:
+        return False
+    # Decided once, on the first catalog read, when the user is known.
+    if not hasattr(request, "_store_uses_replica"):
+        request._store_uses_replica = not is_pinned(request)
+    return request._store_uses_replica
+
+
+def read_from_replica(request):
+    return getattr(request, "_store_read_replica", False)
+
+
+def is_settled(request, scopes):
+    """
+    Whether a response built for ``request`` can be shared under the
+    current versions of ``scopes``. One read from a replica within
+    ``STORE_REPLICA_PIN_SECONDS`` of the last write to those scopes may
+    still hold the old rows, so it must not be cached or given validators.
+    """
+    if not read_from_replica(request):
+        return True
+    return time() - cache.get_modified(*scopes) > get_pin_seconds()
+
+
+class ReplicaMiddleware:
+    """
+    Makes the current request visible to ``ReplicaRouter`` and pins clients
+    to the primary after a successful write.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _current_request.set(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_request.reset(token)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            pin(request, response)
+        return response
+
+
+class ReplicaRouter:
+    """
+    Sends catalog reads made while handling a safe request to one of
+    ``STORE_READ_REPLICAS``, unless the client wrote within the last
+    ``STORE_REPLICA_PIN_SECONDS``. Everything else, including every write
+    and every read made while handling a write, goes to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = get_replicas()
+        request = _current_request.get()
+        if not replicas or request is None:
+            return None
+        if model._meta.label_lower not in get_replica_models():
+            return None
+        if not uses_replica(request):
+            return DEFAULT_DB_ALIAS
+        request._store_read_replica = True
+        return choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        # Objects read from a replica must still be saved to the primary.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in get_replicas():
+            return False
+        return None
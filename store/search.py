@@ -0,0 +1,145 @@
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.db.models import (
+    Count,
+    FloatField,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Cast, Coalesce
+
+from .models import ProductSearchTerm
+
+TITLE_WEIGHT = 3
+DESCRIPTION_WEIGHT = 1
+MAX_TERM_LENGTH = 64
+MAX_WEIGHT = 32767
+
+_token_re = re.compile(r"\w+")
+
+
+def tokenize(text):
+    if not text:
+        return []
+    return [token[:MAX_TERM_LENGTH] for token in _token_re.findall(text.lower())]
+
+
+def trigrams(words):
+    """
+    Trigrams of each word padded the way pg_trgm pads them, so that
+    "shirt" yields "  s", " sh", "shi", "hir", "irt", "rt ".
+    """
+    result = set()
+    for word in words:
+        padded = f"  {word} "
+        result.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def build_terms(product, model=ProductSearchTerm):
+    weights = Counter()
+    title_words = tokenize(product.title)
+    for word in title_words:
+        weights[word] += TITLE_WEIGHT
+    for word in tokenize(product.description):
+        weights[word] += DESCRIPTION_WEIGHT
+
+    terms = [
+        model(
+            product_id=product.pk,
+            kind=ProductSearchTerm.KIND_WORD,
+            term=word,
+            weight=min(weight, MAX_WEIGHT),
+        )
+        for word, weight in weights.items()
+    ]
+    terms += [
+        model(
+            product_id=product.pk,
+            kind=ProductSearchTerm.KIND_TRIGRAM,
+            term=trigram,
+            weight=1,
+        )
+        for trigram in trigrams(title_words)
+    ]
+    return terms
+
+
+def index_products(products, model=ProductSearchTerm):
+    """
+    Replace the search terms of the given products. Migrations pass their
+    historical ``model``.
+    """
+    products = list(products)
+    if not products:
+        return
+    model.objects.filter(product_id__in=[product.pk for product in products]).delete()
+    terms = []
+    for product in products:
+        terms += build_terms(product, model)
+    model.objects.bulk_create(terms, batch_size=1000)
+
+
+def search_products(queryset, text):
+    """
+    Filter ``queryset`` to products matching every word of ``text`` and
+    annotate each with ``search_rank``.
+
+    The last word is matched as a prefix so partially typed queries still
+    hit. Candidates come from the term index, one ``pk IN (...)`` per word,
+    so the database never has to scan every product. With
+    ``STORE_SEARCH_TRIGRAM_FALLBACK`` enabled, a word that matches no term
+    at all may instead match products whose titles share enough of its
+    trigrams, which catches misspellings.
+    """
+    words = tokenize(text)
+    if not words:
+        return queryset
+
+    fallback = getattr(settings, "STORE_SEARCH_TRIGRAM_FALLBACK", False)
+    threshold = getattr(settings, "STORE_SEARCH_TRIGRAM_THRESHOLD", 0.3)
+    word_terms = ProductSearchTerm.objects.filter(kind=ProductSearchTerm.KIND_WORD)
+    trigram_terms = ProductSearchTerm.objects.filter(
+        kind=ProductSearchTerm.KIND_TRIGRAM
+    )
+
+    exact, prefix = words[:-1], words[-1]
+    word_rank = Subquery(
+        word_terms.filter(product=OuterRef("pk"))
+        .filter(Q(term__in=exact) | Q(term__startswith=prefix))
+        .values("product")
+        .annotate(rank=Sum("weight"))
+        .values("rank")
+    )
+    rank = Cast(Coalesce(word_rank, 0), FloatField())
+
+    for position, word in enumerate(words):
+        if position == len(words) - 1:
+            matches = word_terms.filter(term__startswith=word)
+        else:
+            matches = word_terms.filter(term=word)
+        if fallback and not matches.exists():
+            word_trigrams = trigrams([word])
+            shared = trigram_terms.filter(term__in=word_trigrams)
+            matches = (
+                shared.values("product")
+                .annotate(shared=Count("term"))
+                .filter(shared__gte=threshold * len(word_trigrams))
+            )
+            similarity = Subquery(
+                shared.filter(product=OuterRef("pk"))
+                .values("product")
+                .annotate(shared=Count("term"))
+                .values("shared")
+            )
+            rank = rank + Cast(Coalesce(similarity, 0), FloatField()) / Value(
+                float(len(word_trigrams))
+            )
+        queryset = queryset.filter(pk__in=matches.values("product"))
+
+    return queryset.annotate(search_rank=rank)
@@ -5,6 +5,7 @@ from .models import (
     Cart,
     CartItem,
     Customer,
+    InsufficientStock,
     Order,
     OrderItem,
     Product,
@@ -12,7 +13,9 @@ from .models import (
     ProductImage,
     Review,
 )
-from .signals import order_created
+from . import cache, events
+from likes.models import LikedItem
+from tags.models import TaggedItem
 
 
 class CollectionSerializer(serializers.ModelSerializer):
@@ -20,23 +23,63 @@ class CollectionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Collection
         fields = ["id", "title", "product_count"]
-
-    product_count = serializers.IntegerField(read_only=True)
+        read_only_fields = ["product_count"]
 
 
 class ProductImageSerializer(serializers.ModelSerializer):
+    variants = serializers.SerializerMethodField()
+
     class Meta:
         model = ProductImage
-        fields = ["id", "image"]
+        fields = ["id", "image", "variants"]
         read_only_fields = ["id"]
 
+    def get_variants(self, image: ProductImage) -> dict:
+        storage = image.image.storage
+        request = self.context.get("request")
+        urls = {}
+        for name, path in image.variants.items():
+            url = storage.url(path)
+            urls[name] = request.build_absolute_uri(url) if request else url
+        return urls
+
     def create(self, validated_data):
         product_id = self.context["product_id"]
         return ProductImage.objects.create(product_id=product_id, **validated_data)
 
 
+# Optional product fields, embedded with ?include=tags,likes.
+PRODUCT_INCLUDES = {
+    "tags": ["tags"],
+    "likes": ["like_count", "liked_by_me"],
+}
+
+
+def get_includes(request):
+    if request is None:
+        return set()
+    return set(request.query_params.get("include", "").split(",")) & set(
+        PRODUCT_INCLUDES
+    )
+
+
+class ProductListSerializer(serializers.ListSerializer):
+    """
+    Loads the optional fields of every product on the page at once, so
+    embedding them costs the same few queries however long the page is.
+    """
+
+    def to_representation(self, data):
+        products = list(data.all() if hasattr(data, "all") else data)
+        self.child.load_includes(products)
+        return super().to_representation(products)
+
+
 class ProductSerializer(serializers.ModelSerializer):
     images = ProductImageSerializer(many=True, read_only=True)
+    tags = serializers.SerializerMethodField()
+    like_count = serializers.SerializerMethodField()
+    liked_by_me = serializers.SerializerMethodField()
     class Meta:
         model = Product
         fields = [
@@ -44,25 +87,92 @@ class ProductSerializer(serializers.ModelSerializer):
             "title",
             "unit_price",
             "price_with_tax",
+            "effective_price",
             "collection",
             "description",
             "slug",
             "inventory",
             "images",
+            "rating_count",
+            "average_rating",
+            "tags",
+            "like_count",
+            "liked_by_me",
         ]
-        read_only_fields = ["price_with_tax"]
+        read_only_fields = [
+            "price_with_tax",
+            "effective_price",
+            "rating_count",
+            "average_rating",
+        ]
+        list_serializer_class = ProductListSerializer
+
+    def get_fields(self):
+        fields = super().get_fields()
+        includes = get_includes(self.context.get("request"))
+        for include, names in PRODUCT_INCLUDES.items():
+            if include not in includes:
+                for name in names:
+                    fields.pop(name, None)
+        return fields
+
+    def load_includes(self, products):
+        ids = [product.pk for product in products]
+        self.included = {}
+        if "tags" in self.fields:
+            self.included["tags"] = TaggedItem.objects.get_tags_for_objects(
+                Product, ids
+            )
+        if "like_count" in self.fields:
+            user = self.context["request"].user
+            self.included["like_count"] = LikedItem.objects.get_like_counts(
+                Product, ids
+            )
+            self.included["liked_by_me"] = LikedItem.objects.get_liked_by(
+                user, Product, ids
+            )
+
+    def get_included(self, name, product: Product):
+        if getattr(self, "included", None) is None:
+            self.load_includes([product])
+        return self.included[name]
+
+    def get_tags(self, product: Product) -> list[str]:
+        tags = self.get_included("tags", product).get(product.pk, [])
+        return [tag.label for tag in tags]
+
+    def get_like_count(self, product: Product) -> int:
+        return self.get_included("like_count", product).get(product.pk, 0)
+
+    def get_liked_by_me(self, product: Product) -> bool:
+        return product.pk in self.get_included("liked_by_me", product)
 
-    price_with_tax = serializers.SerializerMethodField(method_name="calculate_tax")
 
-    def calculate_tax(self, product: Product) -> Decimal:
-        return product.unit_price * Decimal(1.2)
+class ProductImportSerializer(ProductSerializer):
+    """
+    Validates one row of a product import. The collection is given by
+    title and resolved in bulk by the importer.
+    """
+
+    collection = serializers.CharField(max_length=255)
+
+    class Meta(ProductSerializer.Meta):
+        fields = [
+            "title",
+            "slug",
+            "description",
+            "unit_price",
+            "inventory",
+            "collection",
+        ]
 
 
 class ReviewSerializer(serializers.ModelSerializer):
     class Meta:
         model = Review
-        fields = ["id", "name", "description", "date"]
+        fields = ["id", "name", "description", "rating", "date"]
         read_only_fields = ["id", "date"]
+        extra_kwargs = {"rating": {"required": True, "allow_null": False}}
 
     def create(self, validated_data):
         product_id = self.context["product_id"]
@@ -72,7 +182,7 @@ class ReviewSerializer(serializers.ModelSerializer):
 class SimpleProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
-        fields = ["id", "title", "unit_price"]
+        fields = ["id", "title", "unit_price", "effective_price"]
 
 
 class CartItemSerializer(serializers.ModelSerializer):
@@ -90,7 +200,10 @@ class CartItemSerializer(serializers.ModelSerializer):
         read_only_fields = ["id"]
 
     def get_total_price(self, cart_item: CartItem) -> Decimal:
-        return cart_item.quantity * cart_item.product.unit_price
+        total_price = getattr(cart_item, "total_price", None)
+        if total_price is None:
+            total_price = cart_item.quantity * cart_item.product.effective_price
+        return total_price
 
 
 class AddCartItemSerializer(serializers.ModelSerializer):
@@ -101,28 +214,88 @@ class AddCartItemSerializer(serializers.ModelSerializer):
         fields = ["id", "product_id", "quantity"]
         read_only_fields = ["id"]
 
-    def validate_product_id(self, value):
-        if not Product.objects.filter(pk=value).exists():
-            raise serializers.ValidationError("No product with the given ID was found.")
-        return value
-
     def save(self, **kwargs):
         cart_id = self.context["cart_id"]
         product_id = self.validated_data["product_id"]
         quantity = self.validated_data["quantity"]
 
-        try:
-            cart_item = CartItem.objects.get(cart_id=cart_id, product_id=product_id)
-            cart_item.quantity += quantity
-            cart_item.save()
-            self.instance = cart_item
-        except CartItem.DoesNotExist:
-            self.instance = CartItem.objects.create(
-                cart_id=cart_id, **self.validated_data
+        items = CartItem.objects.add_quantities(cart_id, {product_id: quantity})
+        if not items:
+            raise serializers.ValidationError(
+                {"product_id": ["No product with the given ID was found."]}
             )
+        self.instance = items[0]
         return self.instance
 
 
+class BulkCartItemSerializer(serializers.ListSerializer):
+    def validate(self, operations):
+        product_ids = {operation["product_id"] for operation in operations}
+        found = set(
+            Product.objects.filter(pk__in=product_ids).values_list("pk", flat=True)
+        )
+        missing = sorted(product_ids - found)
+        if missing:
+            raise serializers.ValidationError(
+                {"product_id": [f"No product with the given ID was found: {missing}"]}
+            )
+        return operations
+
+    def save(self, **kwargs):
+        cart_id = self.context["cart_id"]
+        add, set_, delete = (
+            CartItemOperationSerializer.OP_ADD,
+            CartItemOperationSerializer.OP_SET,
+            CartItemOperationSerializer.OP_DELETE,
+        )
+        # Fold repeated operations on a product into one net write, in order.
+        plan = {}
+        for operation in self.validated_data:
+            product_id, op = operation["product_id"], operation["op"]
+            quantity = operation.get("quantity")
+            current_op, current_quantity = plan.get(product_id, (None, None))
+            if op == add and current_op == set_:
+                plan[product_id] = (set_, current_quantity + quantity)
+            elif op == add and current_op == add:
+                plan[product_id] = (add, current_quantity + quantity)
+            elif op == add and current_op == delete:
+                plan[product_id] = (set_, quantity)
+            else:
+                plan[product_id] = (op, quantity)
+
+        writes = {add: {}, set_: {}, delete: {}}
+        for product_id, (op, quantity) in plan.items():
+            writes[op][product_id] = quantity
+
+        with transaction.atomic():
+            CartItem.objects.filter(
+                cart_id=cart_id, product_id__in=writes[delete]
+            ).delete()
+            CartItem.objects.set_quantities(cart_id, writes[set_])
+            CartItem.objects.add_quantities(cart_id, writes[add])
+            cache.bump_cart(cart_id)
+        return plan
+
+
+class CartItemOperationSerializer(serializers.Serializer):
+    OP_ADD = "add"
+    OP_SET = "set"
+    OP_DELETE = "delete"
+    OP_CHOICES = [OP_ADD, OP_SET, OP_DELETE]
+
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, max_value=32767, required=False)
+    op = serializers.ChoiceField(choices=OP_CHOICES, default=OP_ADD)
+
+    class Meta:
+        list_serializer_class = BulkCartItemSerializer
+
+    def validate(self, attrs):
+        if attrs["op"] != self.OP_DELETE and "quantity" not in attrs:
+            raise serializers.ValidationError({"quantity": ["This field is required."]})
+        return attrs
+
+
 class UpdateCartItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = CartItem
@@ -139,7 +312,13 @@ class CartSerializer(serializers.ModelSerializer):
         fields = ["id", "items", "total_price"]
 
     def get_total_price(self, cart: Cart) -> Decimal:
-        return sum(item.quantity * item.product.unit_price for item in cart.items.all())
+        total_price = getattr(cart, "total_price", None)
+        if total_price is None:
+            total_price = sum(
+                item.quantity * item.product.effective_price
+                for item in cart.items.all()
+            )
+        return total_price
 
 
 class CustomerSerializer(serializers.ModelSerializer):
@@ -169,38 +348,73 @@ class OrderSerializer(serializers.ModelSerializer):
 class CreateOrderSerializer(serializers.Serializer):
     cart_id = serializers.UUIDField()
 
-    def validate_cart_id(self, value):
-        if not Cart.objects.filter(pk=value).exists():
-            raise serializers.ValidationError("No cart with the given ID was found.")
-        if not CartItem.objects.filter(cart_id=value).count():
-            raise serializers.ValidationError("The cart is empty.")
-        return value
+    def validate(self, attrs):
+        # Load the lines with just what an order item renders; an empty result
+        # is the only case that needs a second look at the cart itself.
+        cart_items = list(
+            CartItem.objects.filter(cart_id=attrs["cart_id"])
+            .select_related("product")
+            .only(
+                "product__title",
+                "product__unit_price",
+                "product__effective_price",
+                "product",
+                "quantity",
+            )
+            .order_by("product_id")
+        )
+        if not cart_items:
+            if not Cart.objects.filter(pk=attrs["cart_id"]).exists():
+                raise serializers.ValidationError(
+                    {"cart_id": ["No cart with the given ID was found."]}
+                )
+            raise serializers.ValidationError({"cart_id": ["The cart is empty."]})
+        attrs["cart_items"] = cart_items
+        return attrs
 
     def save(self, **kwargs):
         with transaction.atomic():
             cart_id = self.validated_data["cart_id"]
+            cart_items = self.validated_data["cart_items"]
             user = self.context["user"]
-            customer = Customer.objects.get(user_id=user.id)
-            order = Order.objects.create(customer=customer)
+            try:
+                Product.objects.reserve(
+                    {item.product_id: item.quantity for item in cart_items}
+                )
+            except InsufficientStock as error:
+                raise serializers.ValidationError(
+                    {
+                        "inventory": {
+                            product_id: [f"Only {available} left in stock."]
+                            for product_id, available in error.available.items()
+                        }
+                    }
+                )
 
-            cart_items = CartItem.objects.select_related("product").filter(
-                cart_id=cart_id
+            customer_id = Customer.objects.values_list("pk", flat=True).get(
+                user_id=user.id
             )
+            order = Order.objects.create(customer_id=customer_id)
             order_items = [
                 OrderItem(
                     order=order,
                     product=item.product,
-                    unit_price=item.product.unit_price,
+                    unit_price=item.product.effective_price,
                     quantity=item.quantity,
                 )
                 for item in cart_items
             ]
 
             OrderItem.objects.bulk_create(order_items)
+            # Serve order.items from memory so rendering the order doesn't
+            # go back to the database; bulk_create has already set the ids.
+            order._prefetched_objects_cache = {"items": order_items}
             Cart.objects.filter(
                 id=cart_id
             ).delete()  # Clear the cart after creating the order
-            order_created.send_robust(sender=self.__class__, order=order)  # Send signal
+            cache.forget_cart(cart_id)
+            # Handlers run on the outbox workers once this transaction commits
+            events.enqueue(events.ORDER_CREATED, {"order_id": order.id})
             return order
 
 
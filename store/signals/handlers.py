@@ -1,10 +1,265 @@
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.contrib.contenttypes.models import ContentType
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
 from django.dispatch import receiver
-from store.models import Customer
+from store import cache, events, images, pricing
+from store.search import index_products
+from store.models import (
+    CartItem,
+    Collection,
+    Customer,
+    Product,
+    ProductImage,
+    Promotion,
+    Review,
+)
+from tags.models import Tag, TaggedItem
 
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def create_customer_for_new_user(sender, instance, created, **kwargs):
     if created:
         Customer.objects.create(user=instance)
+
+
+@receiver(pre_save, sender=Product)
+def remember_previous_collection(sender, instance, raw=False, **kwargs):
+    instance._previous_collection_id = None
+    if instance.pk and not raw:
+        instance._previous_collection_id = (
+            Product.objects.filter(pk=instance.pk)
+            .values_list("collection_id", flat=True)
+            .first()
+        )
+
+
+@receiver(pre_save, sender=Product)
+def price_product(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    tax_rate = (
+        Collection.objects.filter(pk=instance.collection_id)
+        .values_list("tax_rate", flat=True)
+        .first()
+    )
+    discount = None
+    if instance.pk:
+        discount = (
+            Product.objects.filter(pk=instance.pk).best_discounts().get(instance.pk)
+        )
+    instance.price_with_tax = pricing.with_tax(instance.unit_price, tax_rate)
+    instance.effective_price = pricing.with_discount(instance.unit_price, discount)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product(sender, instance, **kwargs):
+    pairs = [(instance.pk, instance.collection_id)]
+    previous = getattr(instance, "_previous_collection_id", None)
+    if previous is not None and previous != instance.collection_id:
+        pairs.append((None, previous))
+    cache.bump_products(pairs)
+
+
+@receiver(post_save, sender=Product)
+def count_saved_product(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_previous_collection_id", None)
+    if created:
+        Collection.objects.adjust_product_counts({instance.collection_id: 1})
+    elif previous is not None and previous != instance.collection_id:
+        Collection.objects.adjust_product_counts(
+            {previous: -1, instance.collection_id: 1}
+        )
+
+
+@receiver(post_delete, sender=Product)
+def count_deleted_product(sender, instance, **kwargs):
+    Collection.objects.adjust_product_counts({instance.collection_id: -1})
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_products([instance])
+
+
+@receiver(pre_save, sender=Review)
+def remember_previous_rating(sender, instance, raw=False, **kwargs):
+    instance._previous_rating = None
+    if instance.pk and not raw:
+        instance._previous_rating = (
+            Review.objects.filter(pk=instance.pk)
+            .values_list("rating", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Review)
+def rate_saved_review(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_previous_rating", None)
+    if instance.rating == previous:
+        return
+    count = (instance.rating is not None) - (previous is not None)
+    total = (instance.rating or 0) - (previous or 0)
+    Product.objects.filter(pk=instance.product_id).adjust_ratings(count, total)
+
+
+@receiver(post_delete, sender=Review)
+def rate_deleted_review(sender, instance, origin=None, **kwargs):
+    # Nothing to adjust when the product itself is being deleted.
+    if instance.rating is None or isinstance(origin, Product):
+        return
+    Product.objects.filter(pk=instance.product_id).adjust_ratings(-1, -instance.rating)
+
+
+@receiver(post_save, sender=TaggedItem)
+@receiver(post_delete, sender=TaggedItem)
+def invalidate_tagged_product(sender, instance, **kwargs):
+    if instance.content_type_id != ContentType.objects.get_for_model(Product).pk:
+        return
+    cache.bump_products(
+        Product.objects.filter(pk=instance.object_id).values_list("id", "collection_id")
+    )
+
+
+@receiver(post_save, sender=Tag)
+def invalidate_renamed_tag(sender, instance, created, **kwargs):
+    if created or instance.label == getattr(instance, "_previous_label", None):
+        return
+    product_ids = TaggedItem.objects.filter(
+        tag=instance, content_type=ContentType.objects.get_for_model(Product)
+    ).values_list("object_id", flat=True)
+    cache.bump_products(
+        Product.objects.filter(pk__in=product_ids).values_list("id", "collection_id")
+    )
+
+
+@receiver(pre_save, sender=ProductImage)
+def hash_product_image(sender, instance, raw=False, **kwargs):
+    if raw or not instance.image or instance.image._committed:
+        return
+    upload = instance.image.file
+    # The streaming upload handler has usually hashed the file already.
+    content_hash = getattr(upload, "content_hash", None)
+    instance.content_hash = content_hash or images.hash_file(upload)
+    existing = images.stored_original(instance.content_hash)
+    if existing:
+        # Point at the file an identical upload already stored.
+        instance.image = existing
+    instance.variants = images.known_variants(instance.content_hash)
+
+
+@receiver(post_save, sender=ProductImage)
+def process_product_image(sender, instance, raw=False, **kwargs):
+    if not raw and instance.image and not instance.variants:
+        events.enqueue(events.PRODUCT_IMAGE_UPLOADED, {"image_id": instance.pk})
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def invalidate_product_image(sender, instance, **kwargs):
+    collection_id = (
+        Product.objects.filter(pk=instance.product_id)
+        .values_list("collection_id", flat=True)
+        .first()
+    )
+    cache.bump_products([(instance.product_id, collection_id)])
+
+
+@receiver(post_save, sender=Collection)
+@receiver(post_delete, sender=Collection)
+def invalidate_collection(sender, instance, **kwargs):
+    cache.bump_collections([instance.pk])
+
+
+@receiver(pre_save, sender=Collection)
+def remember_previous_tax_rate(sender, instance, raw=False, **kwargs):
+    instance._previous_tax_rate = instance.tax_rate
+    if instance.pk and not raw:
+        instance._previous_tax_rate = (
+            Collection.objects.filter(pk=instance.pk)
+            .values_list("tax_rate", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Collection)
+def reprice_collection(sender, instance, created, raw=False, **kwargs):
+    if created or raw:
+        return
+    if instance.tax_rate != getattr(instance, "_previous_tax_rate", None):
+        Product.objects.filter(collection_id=instance.pk).reprice()
+
+
+@receiver(post_save, sender=CartItem)
+def invalidate_cart(sender, instance, **kwargs):
+    # Deletes are bumped by their callers: a post_delete receiver would stop
+    # Django from fast-deleting the items of a checked out cart.
+    cache.bump_cart(instance.cart_id)
+
+
+@receiver(post_save, sender=Promotion)
+def invalidate_promotion(sender, instance, **kwargs):
+    cache.bump_products(instance.product_set.values_list("id", "collection_id"))
+
+
+@receiver(post_save, sender=Promotion)
+def reprice_promoted_products(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        instance.product_set.all().reprice()
+
+
+@receiver(pre_delete, sender=Promotion)
+def remember_promoted_products(sender, instance, **kwargs):
+    # The through rows are cascaded away before post_delete fires.
+    instance._promoted_products = list(
+        instance.product_set.values_list("id", "collection_id")
+    )
+
+
+@receiver(post_delete, sender=Promotion)
+def invalidate_deleted_promotion(sender, instance, **kwargs):
+    promoted = getattr(instance, "_promoted_products", [])
+    cache.bump_products(promoted)
+    Product.objects.filter(pk__in=[pk for pk, _ in promoted]).reprice()
+
+
+@receiver(m2m_changed, sender=Product.promotions.through)
+def invalidate_product_promotions(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        cache.bump_products([(instance.pk, instance.collection_id)])
+    elif pk_set:
+        cache.bump_products(
+            Product.objects.filter(pk__in=pk_set).values_list("id", "collection_id")
+        )
+    else:
+        cache.bump_products(instance.product_set.values_list("id", "collection_id"))
+
+
+@receiver(m2m_changed, sender=Product.promotions.through)
+def reprice_product_promotions(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear" and reverse:
+        # Once cleared, the promotion no longer knows its products.
+        instance._cleared_products = list(
+            instance.product_set.values_list("pk", flat=True)
+        )
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        Product.objects.filter(pk=instance.pk).reprice()
+    elif action == "post_clear":
+        Product.objects.filter(pk__in=instance._cleared_products).reprice()
+    else:
+        Product.objects.filter(pk__in=pk_set).reprice()
@@ -23,3 +23,23 @@ def authenticate(api_client):
         return api_client.force_authenticate(user=User(is_staff=is_staff))
 
     return _authenticate
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Fixture to keep cached responses from leaking between tests."""
+    from django.core.cache import cache
+
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def primary_only(settings):
+    """Fixture to keep reads off replicas, which can't see a test's rows."""
+    settings.STORE_READ_REPLICAS = []
+
+
+@pytest.fixture(autouse=True)
+def no_outbox_workers(settings):
+    """Fixture to keep tests from starting the local outbox worker pool."""
+    settings.STORE_OUTBOX_WORKERS = 0
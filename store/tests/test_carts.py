@@ -0,0 +1,262 @@
+from decimal import Decimal
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from model_bakery import baker
+from pytest import mark
+from store import cache
+from store.models import CartItem
+
+
+@mark.django_db
+class TestAddCartItem:
+
+    def test_if_product_is_new_creates_item(self, api_client: APIClient):
+        cart = baker.make("store.Cart")
+        product = baker.make("store.Product")
+
+        response = api_client.post(
+            reverse("store:cart-items-list", args=[cart.id]),
+            data={"product_id": product.id, "quantity": 2},
+        )
+
+        assert response.status_code == status.HTTP_201_CREATED
+        item = CartItem.objects.get(cart=cart, product=product)
+        assert response.data == {
+            "id": item.id,
+            "product_id": product.id,
+            "quantity": 2,
+        }
+
+    def test_if_product_is_in_cart_increments_quantity(self, api_client: APIClient):
+        cart = baker.make("store.Cart")
+        product = baker.make("store.Product")
+        item = baker.make("store.CartItem", cart=cart, product=product, quantity=2)
+
+        response = api_client.post(
+            reverse("store:cart-items-list", args=[cart.id]),
+            data={"product_id": product.id, "quantity": 3},
+        )
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data["id"] == item.id
+        assert response.data["quantity"] == 5
+        item.refresh_from_db()
+        assert item.quantity == 5
+
+    def test_adding_item_is_a_single_query(
+        self, api_client: APIClient, django_assert_num_queries
+    ):
+        cart = baker.make("store.Cart")
+        product = baker.make("store.Product")
+
+        with django_assert_num_queries(1):
+            api_client.post(
+                reverse("store:cart-items-list", args=[cart.id]),
+                data={"product_id": product.id, "quantity": 1},
+            )
+
+    def test_if_product_does_not_exist_returns_400(self, api_client: APIClient):
+        cart = baker.make("store.Cart")
+
+        response = api_client.post(
+            reverse("store:cart-items-list", args=[cart.id]),
+            data={"product_id": 9999, "quantity": 1},
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "product_id" in response.data
+        assert not CartItem.objects.filter(cart=cart).exists()
+
+
+@mark.django_db
+class TestBulkCartItems:
+
+    def test_applies_add_set_and_delete(self, api_client: APIClient):
+        cart = baker.make("store.Cart")
+        kept, replaced, removed, added = baker.make("store.Product", _quantity=4)
+        baker.make("store.CartItem", cart=cart, product=kept, quantity=1)
+        baker.make("store.CartItem", cart=cart, product=replaced, quantity=1)
+        baker.make("store.CartItem", cart=cart, product=removed, quantity=1)
+
+        response = api_client.post(
+            reverse("store:cart-items-bulk", args=[cart.id]),
+            data=[
+                {"product_id": kept.id, "quantity": 2},
+                {"product_id": replaced.id, "quantity": 7, "op": "set"},
+                {"product_id": removed.id, "op": "delete"},
+                {"product_id": added.id, "quantity": 3},
+                {"product_id": added.id, "quantity": 1},
+            ],
+            format="json",
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["id"] == str(cart.id)
+        quantities = {
+            item["product"]["id"]: item["quantity"] for item in response.data["items"]
+        }
+        assert quantities == {kept.id: 3, replaced.id: 7, added.id: 4}
+
+    def test_if_any_product_is_missing_nothing_is_written(self, api_client: APIClient):
+        cart = baker.make("store.Cart")
+        product = baker.make("store.Product")
+
+        response = api_client.post(
+            reverse("store:cart-items-bulk", args=[cart.id]),
+            data=[
+                {"product_id": product.id, "quantity": 1},
+                {"product_id": 9999, "quantity": 1},
+            ],
+            format="json",
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not CartItem.objects.filter(cart=cart).exists()
+
+    def test_if_quantity_is_missing_returns_400(self, api_client: APIClient):
+        cart = baker.make("store.Cart")
+        product = baker.make("store.Product")
+
+        response = api_client.post(
+            reverse("store:cart-items-bulk", args=[cart.id]),
+            data=[{"product_id": product.id, "op": "set"}],
+            format="json",
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_if_cart_does_not_exist_returns_404(self, api_client: APIClient):
+        response = api_client.post(
+            reverse(
+                "store:cart-items-bulk", args=["00000000-0000-0000-0000-000000000000"]
+            ),
+            data=[],
+            format="json",
+        )
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_if_cart_id_is_malformed_returns_404(self, api_client: APIClient):
+        response = api_client.post(
+            reverse("store:cart-items-bulk", args=["not-a-uuid"]),
+            data=[],
+            format="json",
+        )
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@mark.django_db
+class TestRetrieveCart:
+
+    def test_totals_are_computed_in_two_queries(
+        self, api_client: APIClient, django_assert_num_queries
+    ):
+        cart = baker.make("store.Cart")
+        for unit_price, quantity in [(Decimal("2.50"), 2), (Decimal("10.00"), 3)]:
+            product = baker.make("store.Product", unit_price=unit_price)
+            baker.make("store.CartItem", cart=cart, product=product, quantity=quantity)
+
+        with django_assert_num_queries(2):
+            response = api_client.get(reverse("store:cart-detail", args=[cart.id]))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert sorted(item["total_price"] for item in response.data["items"]) == [
+            Decimal("5.00"),
+            Decimal("30.00"),
+        ]
+        assert response.data["total_price"] == Decimal("35.00")
+
+    def test_if_cart_is_empty_total_is_zero(self, api_client: APIClient):
+        cart = baker.make("store.Cart")
+
+        response = api_client.get(reverse("store:cart-detail", args=[cart.id]))
+
+        assert response.data["items"] == []
+        assert response.data["total_price"] == 0
+
+
+@mark.django_db
+class TestConditionalCart:
+
+    def test_revalidates_until_an_item_changes(self, api_client: APIClient):
+        cart = baker.make("store.Cart")
+        product = baker.make("store.Product")
+        url = reverse("store:cart-detail", args=[cart.id])
+        first = api_client.get(url)
+
+        unchanged = api_client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        api_client.post(
+            reverse("store:cart-items-list", args=[cart.id]),
+            {"product_id": product.id, "quantity": 1},
+        )
+        changed = api_client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+
+        assert "private" in first["Cache-Control"]
+        assert unchanged.status_code == status.HTTP_304_NOT_MODIFIED
+        assert changed.status_code == status.HTTP_200_OK
+        assert len(changed.data["items"]) == 1
+
+    def test_removing_an_item_changes_etag(self, api_client: APIClient):
+        item = baker.make("store.CartItem", quantity=1)
+        url = reverse("store:cart-detail", args=[item.cart_id])
+        etag = api_client.get(url)["ETag"]
+
+        api_client.delete(
+            reverse("store:cart-items-detail", args=[item.cart_id, item.id])
+        )
+
+        assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    def test_only_changes_to_its_own_products_change_etag(self, api_client: APIClient):
+        item = baker.make("store.CartItem", quantity=1)
+        other = baker.make("store.Product")
+        url = reverse("store:cart-detail", args=[item.cart_id])
+        etag = api_client.get(url)["ETag"]
+
+        other.title = "Renamed"
+        other.save()
+        unrelated = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        item.product.unit_price += 1
+        item.product.save()
+        related = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert unrelated.status_code == status.HTTP_304_NOT_MODIFIED
+        assert related.status_code == status.HTTP_200_OK
+
+    def test_deleted_cart_is_not_revalidated(self, api_client: APIClient):
+        cart = baker.make("store.Cart")
+        url = reverse("store:cart-detail", args=[cart.id])
+        etag = api_client.get(url)["ETag"]
+
+        api_client.delete(url)
+
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_deleted_cart_leaves_no_version_keys(self, api_client: APIClient):
+        cart = baker.make("store.Cart")
+        url = reverse("store:cart-detail", args=[cart.id])
+        api_client.get(url)
+
+        api_client.delete(url)
+
+        scope = cache.cart_scope(cart.id)
+        keys = [cache._version_key(*scope), cache._modified_key(*scope)]
+        assert cache.get_cache().get_many(keys) == {}
+
+
+@mark.django_db
+class TestCartPromotions:
+
+    def test_totals_use_effective_prices(self, api_client: APIClient):
+        cart = baker.make("store.Cart")
+        product = baker.make("store.Product", unit_price=Decimal("10.00"))
+        product.promotions.add(baker.make("store.Promotion", discount=0.2))
+        baker.make("store.CartItem", cart=cart, product=product, quantity=3)
+
+        response = api_client.get(reverse("store:cart-detail", args=[cart.id]))
+
+        assert response.data["items"][0]["total_price"] == Decimal("24.00")
+        assert response.data["total_price"] == Decimal("24.00")
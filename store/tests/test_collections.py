@@ -1,4 +1,7 @@
+import io
+
 from django.contrib.auth.models import User
+from django.core.management import call_command
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
@@ -209,3 +212,92 @@ class TestUpdateCollection:
             data=updated_data,
         )
         assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@mark.django_db
+class TestCollectionProductCount:
+    def _count(self, collection):
+        collection.refresh_from_db()
+        return collection.product_count
+
+    def test_counts_created_and_deleted_products(self):
+        collection = baker.make("store.Collection")
+        products = baker.make("store.Product", collection=collection, _quantity=3)
+
+        assert self._count(collection) == 3
+
+        products[0].delete()
+        assert self._count(collection) == 2
+
+        collection.products.all().delete()
+        assert self._count(collection) == 0
+
+    def test_moving_a_product_moves_its_count(self):
+        source, target = baker.make("store.Collection", _quantity=2)
+        product = baker.make("store.Product", collection=source)
+
+        product.collection = target
+        product.save()
+
+        assert self._count(source) == 0
+        assert self._count(target) == 1
+
+    def test_bulk_update_and_create_adjust_counts(self):
+        source, target = baker.make("store.Collection", _quantity=2)
+        baker.make("store.Product", collection=source, _quantity=3)
+        Product = source.products.model
+
+        Product.objects.filter(collection=source).update(collection=target)
+        Product.objects.bulk_create(
+            [Product(title="a", slug="a", unit_price=1, inventory=1, collection=source)]
+        )
+
+        assert self._count(source) == 1
+        assert self._count(target) == 3
+
+    def test_saving_a_loaded_collection_keeps_concurrent_adjustments(self):
+        collection = baker.make("store.Collection")
+        loaded = type(collection).objects.get(pk=collection.pk)
+        baker.make("store.Product", collection=collection, _quantity=2)
+
+        loaded.title = "Renamed"
+        loaded.save()
+
+        assert self._count(collection) == 2
+        assert collection.title == "Renamed"
+
+    def test_reconcile_fixes_drift(self):
+        collection = baker.make("store.Collection")
+        baker.make("store.Product", collection=collection, _quantity=2)
+        type(collection).objects.filter(pk=collection.pk).update(product_count=7)
+
+        call_command("reconcile_collection_counts", stdout=io.StringIO())
+
+        assert self._count(collection) == 2
+
+    def test_list_reads_the_stored_count(
+        self, api_client: APIClient, django_assert_num_queries
+    ):
+        collection = baker.make("store.Collection")
+        baker.make("store.Product", collection=collection, _quantity=2)
+
+        with django_assert_num_queries(1):
+            response = api_client.get(reverse("store:collection-list"))
+
+        assert response.data[0]["product_count"] == 2
+
+
+@mark.django_db
+class TestConditionalCollections:
+    def test_adding_a_product_changes_etag(self, api_client: APIClient):
+        collection = baker.make("store.Collection")
+        url = reverse("store:collection-detail", args=[collection.id])
+        etag = api_client.get(url)["ETag"]
+
+        unchanged = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        baker.make("store.Product", collection=collection)
+        changed = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert unchanged.status_code == status.HTTP_304_NOT_MODIFIED
+        assert changed.status_code == status.HTTP_200_OK
+        assert changed.data["product_count"] == 1
@@ -0,0 +1,186 @@
+from datetime import timedelta
+from time import sleep
+import pytest
+from django.conf import settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from model_bakery import baker
+from pytest import mark
+from store import events
+from store.models import OutboxEvent
+from store.signals import order_created
+
+
+def make_order():
+    user = baker.make(settings.AUTH_USER_MODEL)
+    return baker.make("store.Order", customer=user.customer)
+
+
+@pytest.fixture
+def received():
+    """Fixture recording the orders order_created receivers are called with."""
+    orders = []
+
+    def receiver(sender, order, **kwargs):
+        orders.append(order.id)
+
+    order_created.connect(receiver, weak=False)
+    yield orders
+    order_created.disconnect(receiver)
+
+
+@pytest.fixture
+def failing_receiver():
+    """Fixture adding an order_created receiver that always raises."""
+
+    def receiver(sender, order, **kwargs):
+        raise RuntimeError("SMTP is down")
+
+    order_created.connect(receiver, weak=False)
+    yield receiver
+    order_created.disconnect(receiver)
+
+
+@mark.django_db
+class TestOrderCreatedOutbox:
+
+    def test_checkout_publishes_event_after_commit(
+        self,
+        api_client: APIClient,
+        received,
+        monkeypatch,
+        django_capture_on_commit_callbacks,
+    ):
+        published = []
+        monkeypatch.setattr(events, "publish", published.append)
+        user = baker.make(settings.AUTH_USER_MODEL)
+        api_client.force_authenticate(user=user)
+        cart = baker.make("store.Cart")
+        baker.make("store.CartItem", cart=cart, product__inventory=5, quantity=1)
+
+        with django_capture_on_commit_callbacks(execute=False) as callbacks:
+            response = api_client.post(
+                reverse("store:order-list"), data={"cart_id": cart.id}
+            )
+            assert published == []
+
+        assert response.status_code == status.HTTP_201_CREATED
+        event = OutboxEvent.objects.get()
+        assert event.topic == events.ORDER_CREATED
+        assert event.payload == {"order_id": response.data["id"]}
+        for callback in callbacks:
+            callback()
+        assert published == [event.id]
+        assert received == []
+
+    def test_dispatch_runs_handlers_once(self, received):
+        order = make_order()
+        event = OutboxEvent.objects.create(
+            topic=events.ORDER_CREATED, payload={"order_id": order.id}
+        )
+
+        assert events.dispatch(event.id) is True
+        assert events.dispatch(event.id) is False
+
+        event.refresh_from_db()
+        assert event.status == OutboxEvent.STATUS_DONE
+        assert received == [order.id]
+
+    def test_failed_handler_is_retried_with_backoff(self, failing_receiver):
+        order = make_order()
+        event = OutboxEvent.objects.create(
+            topic=events.ORDER_CREATED, payload={"order_id": order.id}
+        )
+
+        assert events.dispatch(event.id) is False
+
+        event.refresh_from_db()
+        assert event.status == OutboxEvent.STATUS_PENDING
+        assert event.attempts == 1
+        assert "SMTP is down" in event.last_error
+        assert event.available_at > timezone.now()
+        assert events.dispatch_due() == 0
+
+    def test_event_fails_after_max_attempts(self, failing_receiver, settings):
+        settings.STORE_OUTBOX_MAX_ATTEMPTS = 2
+        order = make_order()
+        event = OutboxEvent.objects.create(
+            topic=events.ORDER_CREATED, payload={"order_id": order.id}
+        )
+
+        events.dispatch(event.id)
+        OutboxEvent.objects.filter(pk=event.id).update(
+            available_at=timezone.now() - timedelta(seconds=1)
+        )
+        events.dispatch(event.id)
+
+        event.refresh_from_db()
+        assert event.status == OutboxEvent.STATUS_FAILED
+        assert event.attempts == 2
+
+
+@mark.django_db(transaction=True)
+class TestWorkerPool:
+
+    def _wait_until_done(self, *event_ids):
+        for _ in range(100):
+            pending = OutboxEvent.objects.filter(pk__in=event_ids).exclude(
+                status=OutboxEvent.STATUS_DONE
+            )
+            if not pending.exists():
+                return True
+            sleep(0.05)
+        return False
+
+    def test_workers_handle_published_events(self, received):
+        orders = [make_order() for _ in range(3)]
+        event_ids = [
+            OutboxEvent.objects.create(
+                topic=events.ORDER_CREATED, payload={"order_id": order.id}
+            ).id
+            for order in orders
+        ]
+        queue = events.LocalQueue()
+        pool = events.WorkerPool(queue, workers=2, poll_interval=0.1)
+        pool.start()
+        try:
+            for event_id in event_ids:
+                queue.put(event_id)
+            assert self._wait_until_done(*event_ids)
+        finally:
+            pool.stop()
+
+        assert sorted(received) == sorted(order.id for order in orders)
+
+    def test_workers_sweep_events_that_were_never_announced(self, received):
+        order = make_order()
+        event = OutboxEvent.objects.create(
+            topic=events.ORDER_CREATED, payload={"order_id": order.id}
+        )
+        pool = events.WorkerPool(events.LocalQueue(), workers=1, poll_interval=0.1)
+        pool.start()
+        try:
+            assert self._wait_until_done(event.id)
+        finally:
+            pool.stop()
+
+        assert received == [order.id]
+
+    def test_local_pool_starts_with_the_server_not_on_publish(
+        self, settings, monkeypatch
+    ):
+        settings.STORE_OUTBOX_WORKERS = 1
+        monkeypatch.setattr(events, "_queue", events.LocalQueue())
+        monkeypatch.setattr(events, "_pool", None)
+
+        events.publish(1)
+        assert events._pool is None
+
+        pool = events.start_local_workers()
+        try:
+            assert events._pool is pool
+            assert events.start_local_workers() is pool
+        finally:
+            pool.stop()
@@ -0,0 +1,170 @@
+from hashlib import sha256
+from io import BytesIO
+
+import pytest
+from django.contrib import admin
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from model_bakery import baker
+from PIL import Image
+from pytest import mark
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from store import images
+from store.admin import ProductImageInline
+from store.images import process_product_image
+from store.models import OutboxEvent, Product, ProductImage
+from store.uploads import ImageUploadHandler, UploadTooLarge
+from store.validators import MAX_FILE_SIZE
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    return tmp_path
+
+
+def make_upload(name="photo.png", size=(1600, 900), color="red"):
+    buffer = BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+
+@mark.django_db
+class TestImageVariants:
+
+    def upload(self, api_client, product, upload):
+        return api_client.post(
+            reverse("store:product-images-list", args=[product.id]),
+            {"image": upload},
+            format="multipart",
+        )
+
+    def test_admin_inline_cannot_edit_hash_or_variants(self, rf, admin_user):
+        request = rf.get("/")
+        request.user = admin_user
+        inline = ProductImageInline(Product, admin.site)
+        fields = inline.get_formset(request).form.base_fields
+
+        assert "content_hash" not in fields
+        assert "variants" not in fields
+
+    def test_upload_queues_variants_off_the_request(
+        self, api_client: APIClient, authenticate
+    ):
+        authenticate(is_staff=True)
+        product = baker.make("store.Product")
+
+        response = self.upload(api_client, product, make_upload())
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data["variants"] == {}
+        image = ProductImage.objects.get(pk=response.data["id"])
+        assert len(image.content_hash) == 64
+        assert OutboxEvent.objects.filter(
+            payload={"image_id": image.id}, status=OutboxEvent.STATUS_PENDING
+        ).exists()
+
+    def test_worker_writes_resized_variants(
+        self, api_client: APIClient, authenticate, media_root
+    ):
+        authenticate(is_staff=True)
+        product = baker.make("store.Product")
+        image_id = self.upload(api_client, product, make_upload()).data["id"]
+
+        process_product_image(image_id)
+
+        image = ProductImage.objects.get(pk=image_id)
+        assert set(image.variants) == {"thumbnail", "medium", "webp"}
+        with Image.open(media_root / image.variants["thumbnail"]) as thumbnail:
+            assert thumbnail.size == (150, 84)
+        with Image.open(media_root / image.variants["webp"]) as webp:
+            assert webp.format == "WEBP"
+        response = api_client.get(reverse("store:product-detail", args=[product.id]))
+        assert response.data["images"][0]["variants"]["medium"].endswith(".jpg")
+
+    def test_reupload_reuses_variants(
+        self, api_client: APIClient, authenticate, media_root
+    ):
+        authenticate(is_staff=True)
+        product = baker.make("store.Product")
+        first = self.upload(api_client, product, make_upload()).data["id"]
+        process_product_image(first)
+        files = sorted(media_root.rglob("*"))
+
+        response = self.upload(api_client, product, make_upload("again.png"))
+        process_product_image(first)
+
+        assert response.data["variants"].keys() == {"thumbnail", "medium", "webp"}
+        assert not OutboxEvent.objects.filter(
+            payload={"image_id": response.data["id"]}
+        ).exists()
+        assert sorted(media_root.rglob("*")) == files
+
+
+@mark.django_db
+class TestStreamingUpload:
+
+    def upload(self, api_client, product, upload):
+        return api_client.post(
+            reverse("store:product-images-list", args=[product.id]),
+            {"image": upload},
+            format="multipart",
+        )
+
+    def test_hash_is_computed_while_streaming(
+        self, api_client: APIClient, authenticate, monkeypatch
+    ):
+        authenticate(is_staff=True)
+        product = baker.make("store.Product")
+        upload = make_upload()
+        expected = sha256(upload.read()).hexdigest()
+        upload.seek(0)
+        monkeypatch.setattr(images, "hash_file", None)
+
+        response = self.upload(api_client, product, upload)
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert ProductImage.objects.get(pk=response.data["id"]).content_hash == expected
+
+    def test_identical_upload_shares_the_stored_file(
+        self, api_client: APIClient, authenticate
+    ):
+        authenticate(is_staff=True)
+        product = baker.make("store.Product")
+
+        first = self.upload(api_client, product, make_upload("a.png"))
+        second = self.upload(api_client, product, make_upload("b.png"))
+
+        assert first.data["image"] == second.data["image"]
+
+    def test_oversize_upload_returns_413(self, api_client: APIClient, authenticate):
+        authenticate(is_staff=True)
+        product = baker.make("store.Product")
+        content = b"\x89PNG\r\n\x1a\n" + b"0" * MAX_FILE_SIZE
+        upload = SimpleUploadedFile("big.png", content, content_type="image/png")
+
+        response = self.upload(api_client, product, upload)
+
+        assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        assert not ProductImage.objects.exists()
+
+    def test_oversize_file_is_stopped_mid_stream(self):
+        handler = ImageUploadHandler(max_size=100)
+        handler.new_file("image", "big.png", "image/png", None)
+        handler.receive_data_chunk(b"\x89PNG\r\n\x1a\n" + b"0" * 80, 0)
+
+        with pytest.raises(UploadTooLarge):
+            handler.receive_data_chunk(b"0" * 20, 88)
+
+    def test_non_image_returns_415(self, api_client: APIClient, authenticate):
+        authenticate(is_staff=True)
+        product = baker.make("store.Product")
+        upload = SimpleUploadedFile(
+            "notes.png", b"just some text, not a png", content_type="image/png"
+        )
+
+        response = self.upload(api_client, product, upload)
+
+        assert response.status_code == status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
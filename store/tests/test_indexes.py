@@ -0,0 +1,120 @@
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from model_bakery import baker
+from pytest import mark
+from likes.models import LikedItem
+from store.models import Product
+from tags.models import TaggedItem
+
+
+def capture(api_client, url, params=None):
+    with CaptureQueriesContext(connection) as context:
+        api_client.get(url, params)
+    return [query["sql"] for query in context.captured_queries]
+
+
+def find(queries, table):
+    return next(
+        sql
+        for sql in queries
+        if sql.startswith("SELECT") and f'FROM "{table}"' in sql and "ORDER BY" in sql
+    )
+
+
+def explain(sql):
+    """
+    Return the plan the database picks for ``sql``. PostgreSQL prefers a
+    sequential scan for the handful of rows a test creates, so it is told
+    not to, leaving only the question of which index fits.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute("EXPLAIN " + sql)
+        else:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql)
+        return "\n".join(" ".join(map(str, row)) for row in cursor.fetchall())
+
+
+@mark.django_db
+class TestQueryPlans:
+
+    def test_product_list_seeks_on_price_index(self, api_client: APIClient):
+        baker.make("store.Product", _quantity=3)
+
+        queries = capture(api_client, reverse("store:product-list"), {"cursor": ""})
+
+        assert "store_product_price_idx" in explain(find(queries, "store_product"))
+
+    def test_collection_product_list_uses_collection_index(self, api_client: APIClient):
+        collection = baker.make("store.Collection")
+        baker.make("store.Product", collection=collection, _quantity=3)
+
+        queries = capture(
+            api_client,
+            reverse("store:product-list"),
+            {"cursor": "", "collection_id": collection.id},
+        )
+
+        plan = explain(find(queries, "store_product"))
+        assert "store_product_coll_price_idx" in plan
+
+    def test_recently_updated_products_use_last_update_index(
+        self, api_client: APIClient
+    ):
+        baker.make("store.Product", _quantity=3)
+
+        queries = capture(
+            api_client,
+            reverse("store:product-list"),
+            {"cursor": "", "ordering": "-last_update"},
+        )
+
+        assert "store_product_updated_idx" in explain(find(queries, "store_product"))
+
+    def test_customer_order_history_uses_customer_index(self, api_client: APIClient):
+        user = baker.make(settings.AUTH_USER_MODEL)
+        baker.make("store.Order", customer=user.customer, _quantity=3)
+        api_client.force_authenticate(user=user)
+
+        queries = capture(api_client, reverse("store:order-list"))
+
+        assert "store_order_customer_idx" in explain(find(queries, "store_order"))
+
+    def test_staff_order_list_uses_placed_at_index(self, api_client: APIClient):
+        staff = baker.make(settings.AUTH_USER_MODEL, is_staff=True)
+        baker.make("store.Order", customer=staff.customer, _quantity=3)
+        api_client.force_authenticate(user=staff)
+
+        queries = capture(api_client, reverse("store:order-list"))
+
+        assert "store_order_placed_idx" in explain(find(queries, "store_order"))
+
+    def test_customer_list_does_not_join_users(self, api_client: APIClient):
+        staff = baker.make(settings.AUTH_USER_MODEL, is_staff=True)
+        api_client.force_authenticate(user=staff)
+
+        queries = capture(api_client, reverse("store:customer-list"))
+
+        assert "auth_user" not in find(queries, "store_customer")
+
+    @mark.parametrize(
+        "model, index",
+        [
+            (TaggedItem, "tags_taggeditem_object_idx"),
+            (LikedItem, "likes_likeditem_object_idx"),
+        ],
+    )
+    def test_generic_lookups_use_object_index(self, model, index):
+        product = baker.make("store.Product")
+        content_type = ContentType.objects.get_for_model(Product)
+
+        queryset = model.objects.filter(
+            content_type=content_type, object_id=product.id
+        ).order_by("id")
+
+        assert index in explain(str(queryset.query))
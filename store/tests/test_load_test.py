@@ -0,0 +1,64 @@
+import io
+import json
+
+import pytest
+from django.core.management import CommandError, call_command
+from rest_framework.test import APIClient
+from pytest import mark
+from store.models import Product
+
+
+def seed(tmp_path, *args):
+    output = tmp_path / "dataset.json"
+    call_command(
+        "seed_load_test",
+        "--products=20",
+        "--collections=3",
+        "--users=2",
+        f"--output={output}",
+        *args,
+        stdout=io.StringIO(),
+    )
+    return json.loads(output.read_text())
+
+
+def catalog():
+    return list(
+        Product.objects.order_by("slug").values_list("slug", "title", "unit_price")
+    )
+
+
+@mark.django_db
+class TestSeedLoadTest:
+    def test_same_seed_gives_the_same_catalog(self, tmp_path):
+        seed(tmp_path, "--seed=7")
+        first = catalog()
+
+        seed(tmp_path, "--seed=7", "--flush")
+
+        assert catalog() == first
+
+    def test_manifest_lists_the_seeded_data(self, tmp_path):
+        manifest = seed(tmp_path)
+
+        assert sorted(manifest["product_ids"]) == sorted(
+            Product.objects.values_list("id", flat=True)
+        )
+        assert len(manifest["collection_ids"]) == 3
+        assert manifest["usernames"] == ["loadtest0", "loadtest1"]
+
+    def test_seeded_users_can_log_in(self, tmp_path, api_client: APIClient):
+        manifest = seed(tmp_path)
+
+        response = api_client.post(
+            "/auth/jwt/create/",
+            {"username": manifest["usernames"][0], "password": manifest["password"]},
+        )
+
+        assert "access" in response.data
+
+    def test_reseeding_requires_flush(self, tmp_path):
+        seed(tmp_path)
+
+        with pytest.raises(CommandError):
+            seed(tmp_path)
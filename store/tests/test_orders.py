@@ -0,0 +1,304 @@
+import csv
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from time import sleep
+from django.conf import settings
+from django.db import OperationalError, connection
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.test import APIClient
+from model_bakery import baker
+from pytest import mark
+from store import cache
+from store.models import Cart, Order, OrderItem
+from store.serializers import CreateOrderSerializer
+
+
+def make_cart(*lines):
+    cart = baker.make("store.Cart")
+    for product, quantity in lines:
+        baker.make("store.CartItem", cart=cart, product=product, quantity=quantity)
+    return cart
+
+
+@mark.django_db
+class TestCreateOrder:
+
+    def test_checkout_decrements_inventory(self, api_client: APIClient):
+        user = baker.make(settings.AUTH_USER_MODEL)
+        api_client.force_authenticate(user=user)
+        shirt = baker.make("store.Product", inventory=5)
+        mug = baker.make("store.Product", inventory=2)
+        cart = make_cart((shirt, 3), (mug, 2))
+
+        response = api_client.post(
+            reverse("store:order-list"), data={"cart_id": cart.id}
+        )
+
+        assert response.status_code == status.HTTP_201_CREATED
+        shirt.refresh_from_db()
+        mug.refresh_from_db()
+        assert (shirt.inventory, mug.inventory) == (2, 0)
+        assert not Cart.objects.filter(pk=cart.id).exists()
+
+    def test_checkout_bumps_the_cart_version(self, api_client: APIClient):
+        api_client.force_authenticate(user=baker.make(settings.AUTH_USER_MODEL))
+        cart = make_cart((baker.make("store.Product", inventory=1), 1))
+        (before,) = cache.get_versions(cache.cart_scope(cart.id))
+
+        api_client.post(reverse("store:order-list"), data={"cart_id": cart.id})
+
+        (after,) = cache.get_versions(cache.cart_scope(cart.id))
+        assert after > before
+
+    def test_if_stock_is_short_reports_each_product(self, api_client: APIClient):
+        user = baker.make(settings.AUTH_USER_MODEL)
+        api_client.force_authenticate(user=user)
+        shirt = baker.make("store.Product", inventory=5)
+        mug = baker.make("store.Product", inventory=1)
+        hat = baker.make("store.Product", inventory=0)
+        cart = make_cart((shirt, 3), (mug, 2), (hat, 1))
+
+        response = api_client.post(
+            reverse("store:order-list"), data={"cart_id": cart.id}
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert set(response.data["inventory"]) == {mug.id, hat.id}
+        shirt.refresh_from_db()
+        assert shirt.inventory == 5
+        assert Cart.objects.filter(pk=cart.id).exists()
+
+    def test_order_items_are_priced_with_promotions(self, api_client: APIClient):
+        user = baker.make(settings.AUTH_USER_MODEL)
+        api_client.force_authenticate(user=user)
+        shirt = baker.make("store.Product", unit_price=Decimal("20.00"), inventory=5)
+        shirt.promotions.add(baker.make("store.Promotion", discount=0.25))
+        cart = make_cart((shirt, 1))
+
+        response = api_client.post(
+            reverse("store:order-list"), data={"cart_id": cart.id}
+        )
+
+        assert response.data["items"][0]["unit_price"] == Decimal("15.00")
+
+    @mark.parametrize("lines", [1, 6])
+    def test_checkout_query_count_is_constant(
+        self, api_client: APIClient, django_assert_num_queries, lines
+    ):
+        user = baker.make(settings.AUTH_USER_MODEL)
+        api_client.force_authenticate(user=user)
+        products = baker.make("store.Product", inventory=10, _quantity=lines)
+        cart = make_cart(*[(product, 1) for product in products])
+
+        # Load cart lines; savepoint; lock and decrement stock; look up the
+        # customer; insert the order and its items; select and delete the
+        # cart with its items; record the outbox event; release the savepoint.
+        with django_assert_num_queries(12):
+            response = api_client.post(
+                reverse("store:order-list"), data={"cart_id": cart.id}
+            )
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert len(response.data["items"]) == lines
+        assert all(item["id"] for item in response.data["items"])
+
+    def test_if_cart_does_not_exist_returns_400(self, api_client: APIClient):
+        user = baker.make(settings.AUTH_USER_MODEL)
+        api_client.force_authenticate(user=user)
+
+        response = api_client.post(
+            reverse("store:order-list"),
+            data={"cart_id": "00000000-0000-0000-0000-000000000000"},
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data["cart_id"] == ["No cart with the given ID was found."]
+
+    def test_if_cart_is_empty_returns_400(self, api_client: APIClient):
+        user = baker.make(settings.AUTH_USER_MODEL)
+        api_client.force_authenticate(user=user)
+        cart = make_cart()
+
+        response = api_client.post(
+            reverse("store:order-list"), data={"cart_id": cart.id}
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data["cart_id"] == ["The cart is empty."]
+
+
+def checkout(user, cart_id):
+    """
+    Place one order from its own thread and connection, retrying while
+    SQLite reports lock contention. Returns True if the order went through.
+    """
+    try:
+        for attempt in range(100):
+            serializer = CreateOrderSerializer(
+                data={"cart_id": cart_id}, context={"user": user}
+            )
+            try:
+                serializer.is_valid(raise_exception=True)
+                serializer.save()
+                return True
+            except OperationalError:
+                sleep(0.01 * attempt)
+            except serializers.ValidationError:
+                return False
+        raise TimeoutError("Checkout kept failing with lock contention.")
+    finally:
+        connection.close()
+
+
+@mark.django_db(transaction=True)
+class TestConcurrentCheckout:
+
+    def test_hot_product_is_never_oversold(self):
+        stock, buyers = 5, 12
+        product = baker.make("store.Product", inventory=stock)
+        users = baker.make(settings.AUTH_USER_MODEL, _quantity=buyers)
+        carts = [make_cart((product, 1)) for _ in range(buyers)]
+
+        with ThreadPoolExecutor(max_workers=buyers) as pool:
+            results = list(pool.map(checkout, users, [cart.id for cart in carts]))
+
+        product.refresh_from_db()
+        assert results.count(True) == stock
+        assert product.inventory == 0
+        assert OrderItem.objects.filter(product=product).count() == stock
+
+
+def make_order(customer, placed_at=None, lines=2, **kwargs):
+    order = baker.make("store.Order", customer=customer, **kwargs)
+    if placed_at is not None:
+        Order.objects.filter(pk=order.pk).update(placed_at=placed_at)
+    for product in baker.make("store.Product", _quantity=lines):
+        baker.make(
+            "store.OrderItem",
+            order=order,
+            product=product,
+            unit_price=product.unit_price,
+            quantity=1,
+        )
+    return order
+
+
+@mark.django_db
+class TestListOrders:
+
+    @mark.parametrize("orders", [2, 8])
+    def test_query_count_does_not_grow_with_orders(
+        self, api_client: APIClient, django_assert_num_queries, orders
+    ):
+        staff = baker.make(settings.AUTH_USER_MODEL, is_staff=True)
+        api_client.force_authenticate(user=staff)
+        for _ in range(orders):
+            make_order(baker.make(settings.AUTH_USER_MODEL).customer, lines=3)
+
+        # Count, orders page, items with their products.
+        with django_assert_num_queries(3):
+            response = api_client.get(reverse("store:order-list"))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["count"] == orders
+        assert all(len(order["items"]) == 3 for order in response.data["results"])
+
+    def test_customer_sees_only_own_orders(self, api_client: APIClient):
+        user = baker.make(settings.AUTH_USER_MODEL)
+        api_client.force_authenticate(user=user)
+        own = make_order(user.customer)
+        make_order(baker.make(settings.AUTH_USER_MODEL).customer)
+
+        response = api_client.get(reverse("store:order-list"))
+
+        assert [order["id"] for order in response.data["results"]] == [own.id]
+
+    def test_filters_by_payment_status_and_placed_at(self, api_client: APIClient):
+        user = baker.make(settings.AUTH_USER_MODEL)
+        api_client.force_authenticate(user=user)
+        now = timezone.now()
+        match = make_order(
+            user.customer,
+            placed_at=now - timedelta(days=2),
+            payment_status=Order.PAYMENT_STATUS_COMPLETE,
+        )
+        make_order(
+            user.customer,
+            placed_at=now - timedelta(days=10),
+            payment_status=Order.PAYMENT_STATUS_COMPLETE,
+        )
+        make_order(user.customer, placed_at=now - timedelta(days=2))
+
+        response = api_client.get(
+            reverse("store:order-list"),
+            {
+                "payment_status": Order.PAYMENT_STATUS_COMPLETE,
+                "placed_at__gte": (now - timedelta(days=5)).isoformat(),
+                "placed_at__lte": now.isoformat(),
+            },
+        )
+
+        assert [order["id"] for order in response.data["results"]] == [match.id]
+
+
+@mark.django_db
+class TestExportOrders:
+
+    def _content(self, response):
+        return b"".join(response.streaming_content).decode("utf-8")
+
+    def test_if_user_is_not_admin_returns_403(self, api_client: APIClient):
+        user = baker.make(settings.AUTH_USER_MODEL)
+        api_client.force_authenticate(user=user)
+
+        response = api_client.get(reverse("store:order-export"))
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_exports_one_csv_row_per_item_with_totals(self, api_client: APIClient):
+        staff = baker.make(settings.AUTH_USER_MODEL, is_staff=True)
+        api_client.force_authenticate(user=staff)
+        order = make_order(staff.customer, lines=2)
+
+        response = api_client.get(reverse("store:order-export"), {"format": "csv"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response["Content-Type"].startswith("text/csv")
+        rows = list(csv.DictReader(io.StringIO(self._content(response))))
+        assert len(rows) == 2
+        total = sum(item.unit_price for item in order.items.all())
+        assert {row["order_id"] for row in rows} == {str(order.id)}
+        assert {Decimal(row["order_total"]) for row in rows} == {total}
+
+    def test_exports_one_ndjson_document_per_order(self, api_client: APIClient):
+        staff = baker.make(settings.AUTH_USER_MODEL, is_staff=True)
+        api_client.force_authenticate(user=staff)
+        first = make_order(staff.customer, lines=2)
+        second = make_order(staff.customer, lines=3)
+
+        response = api_client.get(reverse("store:order-export"), {"format": "ndjson"})
+
+        documents = [json.loads(line) for line in self._content(response).splitlines()]
+        assert [document["id"] for document in documents] == [first.id, second.id]
+        assert [len(document["items"]) for document in documents] == [2, 3]
+
+    def test_export_honors_filters(self, api_client: APIClient):
+        staff = baker.make(settings.AUTH_USER_MODEL, is_staff=True)
+        api_client.force_authenticate(user=staff)
+        paid = make_order(
+            staff.customer, payment_status=Order.PAYMENT_STATUS_COMPLETE, lines=1
+        )
+        make_order(staff.customer, lines=1)
+
+        response = api_client.get(
+            reverse("store:order-export"),
+            {"format": "ndjson", "payment_status": Order.PAYMENT_STATUS_COMPLETE},
+        )
+
+        documents = [json.loads(line) for line in self._content(response).splitlines()]
+        assert [document["id"] for document in documents] == [paid.id]
@@ -1,10 +1,22 @@
+import base64
+import io
+import json
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 import pytest
 from rest_framework import status
 from rest_framework.test import APIClient
 from pytest import mark
 from model_bakery import baker
-from store.models import Product
+from store import cache
+from store.models import Product, Promotion
+from likes.models import LikedItem
+from tags.models import Tag, TaggedItem
 
 
 @pytest.fixture
@@ -245,3 +257,746 @@ class TestUpdateProduct:
         assert response.status_code == status.HTTP_200_OK
         for key, value in product_payload.items():
             assert response.data[key] == value
+
+
+@mark.django_db
+class TestKeysetPagination:
+
+    def _walk(self, api_client: APIClient, url: str):
+        ids = []
+        while url:
+            response = api_client.get(url)
+            assert response.status_code == status.HTTP_200_OK
+            ids.extend(product["id"] for product in response.data["results"])
+            url = response.data["next"]
+        return ids
+
+    def test_first_page_skips_count(self, api_client: APIClient, create_product):
+        create_product()
+        response = api_client.get(reverse("store:product-list") + "?cursor=")
+        assert response.status_code == status.HTTP_200_OK
+        assert "count" not in response.data
+        assert response.data["previous"] is None
+        assert response.data["next"] is None
+
+    def test_exact_count_is_opt_in(self, api_client: APIClient, create_product):
+        create_product()
+        create_product()
+        response = api_client.get(
+            reverse("store:product-list") + "?cursor=&count=exact"
+        )
+        assert response.data["count"] == 2
+
+    def test_walks_ties_on_ordering_field_once(
+        self, api_client: APIClient, create_product
+    ):
+        collection = baker.make("store.Collection")
+        products = [
+            create_product(unit_price=10 + i % 3, collection=collection)
+            for i in range(25)
+        ]
+        ids = self._walk(
+            api_client, reverse("store:product-list") + "?cursor=&ordering=-unit_price"
+        )
+        expected = [p.id for p in sorted(products, key=lambda p: (-p.unit_price, p.id))]
+        assert ids == expected
+
+    def test_previous_link_returns_prior_page(
+        self, api_client: APIClient, create_product
+    ):
+        for i in range(15):
+            create_product(unit_price=10 + i)
+        first = api_client.get(reverse("store:product-list") + "?cursor=")
+        second = api_client.get(first.data["next"])
+        back = api_client.get(second.data["previous"])
+        assert back.data["results"] == first.data["results"]
+        assert back.data["previous"] is None
+
+    def test_filters_apply_to_keyset_pages(self, api_client: APIClient, create_product):
+        collection = baker.make("store.Collection")
+        for _ in range(12):
+            create_product(collection=collection)
+        create_product()
+        ids = self._walk(
+            api_client,
+            reverse("store:product-list") + f"?cursor=&collection_id={collection.id}",
+        )
+        assert len(ids) == 12
+
+    def test_invalid_cursor_returns_404(self, api_client: APIClient):
+        response = api_client.get(reverse("store:product-list") + "?cursor=garbage")
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    @pytest.mark.parametrize(
+        "token", [{"v": ["abc", 1], "r": 0}, {"v": "ab", "r": 0}, ["abc", 1]]
+    )
+    def test_tampered_cursor_returns_404(self, api_client: APIClient, token):
+        cursor = base64.b64encode(json.dumps(token).encode()).decode()
+        response = api_client.get(reverse("store:product-list"), {"cursor": cursor})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@mark.django_db
+class TestProductResponseCache:
+
+    def test_repeated_list_is_served_from_cache(
+        self, api_client: APIClient, create_product, django_assert_num_queries
+    ):
+        create_product()
+        url = reverse("store:product-list") + "?ordering=-unit_price"
+        first = api_client.get(url)
+        with django_assert_num_queries(0):
+            second = api_client.get(url)
+        assert second.data == first.data
+
+    def test_queryset_update_invalidates_detail(
+        self, api_client: APIClient, create_product
+    ):
+        product = create_product(inventory=20)
+        url = reverse("store:product-detail", args=[product.id])
+        api_client.get(url)
+
+        Product.objects.filter(pk=product.id).update(inventory=0)
+
+        response = api_client.get(url)
+        assert response.data["inventory"] == 0
+
+    def test_save_invalidates_collection_list(
+        self, api_client: APIClient, create_product
+    ):
+        product = create_product(unit_price=10)
+        url = reverse("store:product-list") + f"?collection_id={product.collection_id}"
+        api_client.get(url)
+
+        product.unit_price = 12
+        product.save()
+
+        response = api_client.get(url)
+        assert response.data["results"][0]["unit_price"] == 12
+
+    def test_moving_product_invalidates_old_collection(
+        self, api_client: APIClient, create_product
+    ):
+        product = create_product()
+        old_collection_id = product.collection_id
+        url = reverse("store:product-list") + f"?collection_id={old_collection_id}"
+        assert api_client.get(url).data["count"] == 1
+
+        product.collection = baker.make("store.Collection")
+        product.save()
+
+        assert api_client.get(url).data["count"] == 0
+
+    def test_promotion_change_bumps_product_version(self, create_product):
+        product = create_product()
+        promotion = baker.make("store.Promotion")
+        (before,) = cache.get_versions((cache.PRODUCT, product.id))
+
+        product.promotions.add(promotion)
+
+        (after,) = cache.get_versions((cache.PRODUCT, product.id))
+        assert after > before
+
+
+@mark.django_db
+class TestProductSearch:
+
+    def _search(self, api_client: APIClient, query: str):
+        response = api_client.get(reverse("store:product-list"), {"search": query})
+        assert response.status_code == status.HTTP_200_OK
+        return [product["title"] for product in response.data["results"]]
+
+    def test_title_match_ranks_above_description_match(
+        self, api_client: APIClient, create_product
+    ):
+        create_product(title="Plain mug", description="Goes with a linen shirt")
+        create_product(title="Linen shirt", description="Breathable")
+        assert self._search(api_client, "shirt") == ["Linen shirt", "Plain mug"]
+
+    def test_last_word_matches_as_prefix(self, api_client: APIClient, create_product):
+        create_product(title="Linen shirt")
+        create_product(title="Wool sweater")
+        assert self._search(api_client, "linen sh") == ["Linen shirt"]
+
+    def test_every_word_must_match(self, api_client: APIClient, create_product):
+        create_product(title="Linen shirt")
+        create_product(title="Linen trousers")
+        assert self._search(api_client, "trousers linen") == ["Linen trousers"]
+
+    def test_misspelling_falls_back_to_trigrams(
+        self, api_client: APIClient, create_product, settings
+    ):
+        settings.STORE_SEARCH_TRIGRAM_FALLBACK = True
+        create_product(title="Chocolate cake")
+        create_product(title="Garden hose")
+        assert self._search(api_client, "chocolat cake") == ["Chocolate cake"]
+
+    def test_trigram_fallback_is_off_by_default(
+        self, api_client: APIClient, create_product
+    ):
+        create_product(title="Chocolate cake")
+        assert self._search(api_client, "chocolat cake") == []
+
+    def test_candidates_come_from_the_term_index(
+        self, api_client: APIClient, create_product
+    ):
+        create_product(title="Linen shirt")
+        with CaptureQueriesContext(connection) as context:
+            self._search(api_client, "linen sh")
+        sql = next(q["sql"] for q in context if "store_productsearchterm" in q["sql"])
+        assert "EXISTS" not in sql
+        assert '"store_product"."id" IN (SELECT' in sql
+
+    def test_search_combines_with_filters(self, api_client: APIClient, create_product):
+        product = create_product(title="Linen shirt")
+        create_product(title="Linen shirt")
+        response = api_client.get(
+            reverse("store:product-list"),
+            {"search": "shirt", "collection_id": product.collection_id},
+        )
+        assert [p["id"] for p in response.data["results"]] == [product.id]
+
+    def test_index_follows_title_updates(self, api_client: APIClient, create_product):
+        product = create_product(title="Linen shirt")
+        Product.objects.filter(pk=product.pk).update(title="Wool sweater")
+        assert self._search(api_client, "sweater") == ["Wool sweater"]
+        assert self._search(api_client, "linen") == []
+
+
+@mark.django_db
+class TestConditionalGet:
+
+    def test_returns_validators_and_cache_control(
+        self, api_client: APIClient, create_product
+    ):
+        product = create_product()
+
+        response = api_client.get(reverse("store:product-detail", args=[product.id]))
+
+        assert response["ETag"]
+        assert response["Last-Modified"]
+        assert "public" in response["Cache-Control"]
+
+    def test_matching_etag_returns_304_without_queries(
+        self, api_client: APIClient, create_product, django_assert_num_queries
+    ):
+        create_product()
+        url = reverse("store:product-list")
+        etag = api_client.get(url)["ETag"]
+
+        with django_assert_num_queries(0):
+            response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response["ETag"] == etag
+
+    def test_if_modified_since_returns_304(self, api_client: APIClient, create_product):
+        product = create_product()
+        url = reverse("store:product-detail", args=[product.id])
+        last_modified = api_client.get(url)["Last-Modified"]
+
+        response = api_client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_write_changes_etag(self, api_client: APIClient, create_product):
+        product = create_product()
+        url = reverse("store:product-detail", args=[product.id])
+        etag = api_client.get(url)["ETag"]
+
+        Product.objects.filter(pk=product.id).update(inventory=0)
+
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response["ETag"] != etag
+
+    def test_cache_control_is_configurable(
+        self, api_client: APIClient, create_product, settings
+    ):
+        settings.STORE_CACHE_CONTROL = {"product": {"private": True, "max_age": 5}}
+
+        response = api_client.get(reverse("store:product-list"))
+
+        assert response["Cache-Control"] == "private, max-age=5"
+
+
+@mark.django_db
+class TestPriceWithTax:
+
+    def test_uses_default_rate_with_exact_rounding(self, create_product, settings):
+        settings.STORE_DEFAULT_TAX_RATE = "0.20"
+
+        product = create_product(unit_price=Decimal("10.03"))
+
+        assert product.price_with_tax == Decimal("12.04")
+
+    def test_collection_rate_overrides_default(self, create_product):
+        collection = baker.make("store.Collection", tax_rate=Decimal("0.05"))
+
+        product = create_product(unit_price=Decimal("10.10"), collection=collection)
+
+        assert product.price_with_tax == Decimal("10.61")
+
+    def test_follows_price_and_rate_changes(self, create_product):
+        product = create_product(unit_price=Decimal("10.00"))
+        collection = product.collection
+
+        Product.objects.filter(pk=product.pk).update(unit_price=Decimal("20.00"))
+        product.refresh_from_db()
+        assert product.price_with_tax == Decimal("24.00")
+
+        collection.tax_rate = Decimal("0.10")
+        collection.save()
+        product.refresh_from_db()
+        assert product.price_with_tax == Decimal("22.00")
+
+    def test_orders_and_filters_in_the_database(
+        self, api_client: APIClient, create_product
+    ):
+        collection = baker.make("store.Collection", tax_rate=Decimal("0.50"))
+        cheap_but_taxed = create_product(unit_price=10, collection=collection)
+        plain = create_product(unit_price=12, collection=baker.make("store.Collection"))
+
+        response = api_client.get(
+            reverse("store:product-list"), {"ordering": "-price_with_tax"}
+        )
+        filtered = api_client.get(
+            reverse("store:product-list"), {"price_with_tax__lt": 15}
+        )
+
+        assert [p["id"] for p in response.data["results"]] == [
+            cheap_but_taxed.id,
+            plain.id,
+        ]
+        assert [p["id"] for p in filtered.data["results"]] == [plain.id]
+
+
+@mark.django_db
+class TestEffectivePrice:
+
+    def test_best_active_promotion_wins(self, create_product):
+        product = create_product(unit_price=Decimal("40.00"))
+        product.promotions.add(
+            baker.make("store.Promotion", discount=0.1),
+            baker.make("store.Promotion", discount=0.25),
+            baker.make("store.Promotion", discount=0.5, is_active=False),
+        )
+
+        product.refresh_from_db()
+        assert product.effective_price == Decimal("30.00")
+
+    def test_follows_promotion_changes(self, create_product):
+        product = create_product(unit_price=Decimal("40.00"))
+        promotion = baker.make("store.Promotion", discount=0.1)
+        promotion.product_set.add(product)
+
+        promotion.discount = 0.2
+        promotion.save()
+        product.refresh_from_db()
+        assert product.effective_price == Decimal("32.00")
+
+        Promotion.objects.filter(pk=promotion.pk).update(is_active=False)
+        product.refresh_from_db()
+        assert product.effective_price == Decimal("40.00")
+
+        promotion.is_active = True
+        promotion.save()
+        promotion.product_set.clear()
+        product.refresh_from_db()
+        assert product.effective_price == Decimal("40.00")
+
+    def test_deleting_promotion_restores_price(self, create_product):
+        product = create_product(unit_price=Decimal("40.00"))
+        promotion = baker.make("store.Promotion", discount=0.5)
+        product.promotions.add(promotion)
+
+        promotion.delete()
+
+        product.refresh_from_db()
+        assert product.effective_price == Decimal("40.00")
+
+    def test_list_exposes_effective_price_without_extra_queries(
+        self, api_client: APIClient, create_product, django_assert_num_queries
+    ):
+        product = create_product(unit_price=Decimal("10.00"))
+        product.promotions.add(baker.make("store.Promotion", discount=0.3))
+
+        with django_assert_num_queries(3):
+            response = api_client.get(reverse("store:product-list"))
+
+        assert response.data["results"][0]["effective_price"] == Decimal("7.00")
+
+
+@mark.django_db
+class TestImportProducts:
+
+    def post_csv(self, api_client, body, **params):
+        return api_client.generic(
+            "POST",
+            reverse("store:product-import-products"),
+            body.encode("utf-8"),
+            content_type="text/csv",
+            QUERY_STRING="&".join(f"{key}={value}" for key, value in params.items()),
+        )
+
+    def test_if_user_is_not_admin_returns_403(
+        self, api_client: APIClient, authenticate
+    ):
+        authenticate(is_staff=False)
+
+        response = self.post_csv(api_client, "title,slug\n")
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_creates_and_updates_by_slug(self, api_client: APIClient, authenticate):
+        authenticate(is_staff=True)
+        shirts = baker.make("store.Collection", title="Shirts")
+        mugs = baker.make("store.Collection", title="Mugs")
+        existing = baker.make(
+            "store.Product", slug="red-shirt", unit_price=5, collection=mugs
+        )
+        body = (
+            "title,slug,description,unit_price,inventory,collection\n"
+            "Red shirt,red-shirt,Soft,12.50,4,Shirts\n"
+            "Blue shirt,blue-shirt,,10.00,7,Shirts\n"
+        )
+
+        response = self.post_csv(api_client, body)
+
+        assert response.data["created"] == 1
+        assert response.data["updated"] == 1
+        existing.refresh_from_db()
+        assert (existing.title, existing.unit_price) == ("Red shirt", Decimal("12.50"))
+        assert existing.collection_id == shirts.id
+        assert existing.price_with_tax == Decimal("15.00")
+        shirts.refresh_from_db()
+        mugs.refresh_from_db()
+        assert (shirts.product_count, mugs.product_count) == (2, 0)
+        search = api_client.get(reverse("store:product-list"), {"search": "blue"})
+        assert [p["slug"] for p in search.data["results"]] == ["blue-shirt"]
+
+    def test_reports_invalid_rows_and_imports_the_rest(
+        self, api_client: APIClient, authenticate
+    ):
+        authenticate(is_staff=True)
+        baker.make("store.Collection", title="Shirts")
+        body = (
+            "title,slug,description,unit_price,inventory,collection\n"
+            "Good,good,,10,1,Shirts\n"
+            "Cheap,cheap,,0.50,1,Shirts\n"
+            "Lost,lost,,10,1,Nowhere\n"
+        )
+
+        response = self.post_csv(api_client, body)
+
+        assert response.data["created"] == 1
+        assert [error["row"] for error in response.data["errors"]] == [2, 3]
+        assert "unit_price" in response.data["errors"][0]["errors"]
+        assert list(Product.objects.values_list("slug", flat=True)) == ["good"]
+
+    def test_unchanged_rows_are_not_counted_as_updated(
+        self, api_client: APIClient, authenticate
+    ):
+        authenticate(is_staff=True)
+        baker.make("store.Collection", title="Shirts")
+        body = "title,slug,unit_price,inventory,collection\nNew,new,10,1,Shirts\n"
+        self.post_csv(api_client, body)
+
+        response = self.post_csv(api_client, body)
+
+        assert (response.data["updated"], response.data["unchanged"]) == (0, 1)
+
+    def test_reports_malformed_ndjson_lines(self, api_client: APIClient, authenticate):
+        authenticate(is_staff=True)
+        baker.make("store.Collection", title="Shirts")
+        good = {"title": "Good", "slug": "good", "unit_price": "10", "inventory": 1}
+        body = '{"title": \n' + json.dumps({**good, "collection": "Shirts"}) + "\n"
+
+        response = api_client.generic(
+            "POST",
+            reverse("store:product-import-products"),
+            body.encode("utf-8"),
+            content_type="application/x-ndjson",
+        )
+
+        assert response.data["created"] == 1
+        assert [error["row"] for error in response.data["errors"]] == [1]
+
+    def test_if_body_is_not_utf8_returns_400(self, api_client: APIClient, authenticate):
+        authenticate(is_staff=True)
+
+        response = api_client.generic(
+            "POST",
+            reverse("store:product-import-products"),
+            b"title,slug\n\xff\xfe,bad\n",
+            content_type="text/csv",
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_accepts_csv_with_byte_order_mark(
+        self, api_client: APIClient, authenticate, tmp_path
+    ):
+        authenticate(is_staff=True)
+        baker.make("store.Collection", title="Shirts")
+        body = "\ufefftitle,slug,unit_price,inventory,collection\n{},10,1,Shirts\n"
+        path = tmp_path / "products.csv"
+        path.write_text(body.format("File,file"), encoding="utf-8")
+
+        response = self.post_csv(api_client, body.format("Body,body"))
+        call_command("import_products", str(path), stdout=io.StringIO())
+
+        assert (response.data["created"], response.data["rejected"]) == (1, 0)
+        assert sorted(Product.objects.values_list("slug", flat=True)) == [
+            "body",
+            "file",
+        ]
+
+    def test_dry_run_writes_nothing(self, api_client: APIClient, authenticate):
+        authenticate(is_staff=True)
+        baker.make("store.Collection", title="Shirts")
+        body = "title,slug,unit_price,inventory,collection\nNew,new,10,1,Shirts\n"
+
+        response = self.post_csv(api_client, body, dry_run=1)
+
+        assert response.data["created"] == 1
+        assert response.data["dry_run"] is True
+        assert not Product.objects.exists()
+
+    def test_command_imports_ndjson_in_batches(self, tmp_path):
+        baker.make("store.Collection", title="Shirts")
+        path = tmp_path / "products.ndjson"
+        path.write_text(
+            "".join(
+                json.dumps(
+                    {
+                        "title": f"Shirt {n}",
+                        "slug": f"shirt-{n}",
+                        "unit_price": "10.00",
+                        "inventory": n,
+                        "collection": "Shirts",
+                    }
+                )
+                + "\n"
+                for n in range(5)
+            )
+        )
+        out = io.StringIO()
+
+        call_command("import_products", str(path), "--batch-size=2", stdout=out)
+
+        assert Product.objects.count() == 5
+        assert "Created 5, updated 0, rejected 0 rows" in out.getvalue()
+
+
+def tag(product, label):
+    tag, _ = Tag.objects.get_or_create(label=label)
+    return TaggedItem.objects.create(tag=tag, content_object=product)
+
+
+@mark.django_db
+class TestProductTags:
+
+    def test_tags_are_only_embedded_on_request(
+        self, api_client: APIClient, create_product
+    ):
+        tag(create_product(), "summer")
+
+        response = api_client.get(reverse("store:product-list"))
+
+        assert "tags" not in response.data["results"][0]
+
+    def test_list_embeds_tags_without_a_query_per_product(self, api_client: APIClient):
+        def list_queries(count):
+            for product in baker.make("store.Product", _quantity=count):
+                tag(product, "summer")
+                tag(product, "cotton")
+            with CaptureQueriesContext(connection) as context:
+                response = api_client.get(
+                    reverse("store:product-list"), {"include": "tags"}
+                )
+            Product.objects.all().delete()
+            return response, len(context.captured_queries)
+
+        response, few = list_queries(2)
+        _, many = list_queries(8)
+
+        assert response.data["results"][0]["tags"] == ["cotton", "summer"]
+        assert few == many
+
+    def test_detail_embeds_tags(self, api_client: APIClient, create_product):
+        product = create_product()
+        tag(product, "summer")
+
+        response = api_client.get(
+            reverse("store:product-detail", args=[product.id]), {"include": "tags"}
+        )
+
+        assert response.data["tags"] == ["summer"]
+
+    def test_filters_by_tag(self, api_client: APIClient):
+        summer, winter = baker.make("store.Product", _quantity=2)
+        tag(summer, "summer")
+        tag(winter, "winter")
+
+        response = api_client.get(reverse("store:product-list"), {"tag": "summer"})
+
+        assert [product["id"] for product in response.data["results"]] == [summer.id]
+
+    def test_tag_lookup_is_cached(self, django_assert_num_queries):
+        product = baker.make("store.Product")
+        tag(product, "summer")
+        TaggedItem.objects.get_object_ids_for(Product, "summer")
+
+        with django_assert_num_queries(0):
+            ids = TaggedItem.objects.get_object_ids_for(Product, "summer")
+
+        assert ids == [product.id]
+
+    def test_tag_lookup_uses_store_cache_alias(self, settings):
+        settings.CACHES = {
+            **settings.CACHES,
+            "store": {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                "LOCATION": "store",
+            },
+        }
+        settings.STORE_CACHE_ALIAS = "store"
+        tag(baker.make("store.Product"), "summer")
+        TaggedItem.objects.get_object_ids_for(Product, "summer")
+
+        caches["store"].clear()
+
+        with CaptureQueriesContext(connection) as queries:
+            TaggedItem.objects.get_object_ids_for(Product, "summer")
+        assert len(queries)
+
+    def test_tagging_invalidates_filtered_list(self, api_client: APIClient):
+        product = baker.make("store.Product")
+        url = reverse("store:product-list")
+        assert api_client.get(url, {"tag": "summer"}).data["count"] == 0
+
+        tag(product, "summer")
+
+        assert api_client.get(url, {"tag": "summer"}).data["count"] == 1
+
+    def test_renaming_tag_invalidates_embedded_tags(self, api_client: APIClient):
+        product = baker.make("store.Product")
+        item = tag(product, "summer")
+        url = reverse("store:product-detail", args=[product.id])
+        api_client.get(url, {"include": "tags"})
+
+        item.tag.label = "sunny"
+        item.tag.save()
+
+        assert api_client.get(url, {"include": "tags"}).data["tags"] == ["sunny"]
+        assert TaggedItem.objects.get_object_ids_for(Product, "sunny") == [product.id]
+
+
+def like(product, user=None):
+    user = user or baker.make(settings.AUTH_USER_MODEL)
+    LikedItem.objects.like(user, product)
+    return user
+
+
+@mark.django_db
+class TestProductLikes:
+
+    def test_if_user_is_anonymous_returns_401(self, api_client: APIClient):
+        product = baker.make("store.Product")
+
+        response = api_client.post(reverse("store:product-like", args=[product.id]))
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_like_and_unlike(self, api_client: APIClient):
+        product = baker.make("store.Product")
+        like(product)
+        api_client.force_authenticate(user=baker.make(settings.AUTH_USER_MODEL))
+        url = reverse("store:product-like", args=[product.id])
+
+        liked = api_client.post(url)
+        again = api_client.post(url)
+        unliked = api_client.delete(url)
+
+        assert liked.data == {"like_count": 2, "liked_by_me": True}
+        assert again.data == {"like_count": 2, "liked_by_me": True}
+        assert unliked.data == {"like_count": 1, "liked_by_me": False}
+
+    def test_if_product_id_is_malformed_returns_404(self, api_client: APIClient):
+        api_client.force_authenticate(user=baker.make(settings.AUTH_USER_MODEL))
+
+        response = api_client.post(reverse("store:product-like", args=["abc"]))
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_list_embeds_likes_without_a_query_per_product(self, api_client: APIClient):
+        user = baker.make(settings.AUTH_USER_MODEL)
+        api_client.force_authenticate(user=user)
+
+        def list_queries(count):
+            products = baker.make("store.Product", _quantity=count)
+            for product in products:
+                like(product)
+            like(products[0], user)
+            with CaptureQueriesContext(connection) as context:
+                response = api_client.get(
+                    reverse("store:product-list"), {"include": "likes"}
+                )
+            Product.objects.all().delete()
+            return response, len(context.captured_queries)
+
+        response, few = list_queries(2)
+        _, many = list_queries(8)
+
+        first, second = sorted(response.data["results"], key=lambda p: p["id"])
+        assert (first["like_count"], first["liked_by_me"]) == (2, True)
+        assert (second["like_count"], second["liked_by_me"]) == (1, False)
+        assert few == many
+
+    def test_counts_are_served_from_the_cache(self, django_assert_num_queries):
+        product = baker.make("store.Product")
+        like(product)
+        LikedItem.objects.get_like_counts(Product, [product.id])
+
+        user = like(product)
+        with django_assert_num_queries(0):
+            counts = LikedItem.objects.get_like_counts(Product, [product.id])
+        assert counts == {product.id: 2}
+
+        LikedItem.objects.unlike(user, product)
+        assert LikedItem.objects.get_like_counts(Product, [product.id]) == {
+            product.id: 1
+        }
+
+    def test_reconcile_corrects_drifted_counts(self):
+        product = baker.make("store.Product")
+        LikedItem.objects.get_like_counts(Product, [product.id])
+        # bulk_create sends no signals, so the cached count isn't moved.
+        LikedItem.objects.bulk_create(
+            LikedItem(user=user, content_object=product)
+            for user in baker.make(settings.AUTH_USER_MODEL, _quantity=2)
+        )
+        assert LikedItem.objects.get_like_counts(Product, [product.id]) == {
+            product.id: 0
+        }
+
+        out = io.StringIO()
+        call_command("reconcile_like_counts", stdout=out)
+
+        assert LikedItem.objects.get_like_counts(Product, [product.id]) == {
+            product.id: 2
+        }
+        assert "Recounted likes for 1 objects." in out.getvalue()
+
+    def test_responses_with_likes_are_private_and_uncached(self, api_client: APIClient):
+        product = baker.make("store.Product")
+        url = reverse("store:product-detail", args=[product.id])
+        api_client.get(url, {"include": "likes"})
+        like(product)
+
+        response = api_client.get(url, {"include": "likes"})
+
+        assert response.data["like_count"] == 1
+        assert "private" in response["Cache-Control"]
+        assert "ETag" not in response
@@ -0,0 +1,149 @@
+import pytest
+from django.conf import settings
+from django.db import connections, router
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from model_bakery import baker
+from pytest import mark
+from time import time
+from store import replicas
+from store.models import Cart, Product
+
+
+def route(request, status=200):
+    """
+    Run ``request`` through the middleware and return the response along
+    with the databases the product and cart reads were routed to.
+    """
+    routed = {}
+
+    def view(request):
+        routed["product"] = Product.objects.all().db
+        routed["cart"] = Cart.objects.all().db
+        return HttpResponse(status=status)
+
+    response = replicas.ReplicaMiddleware(view)(request)
+    return response, routed
+
+
+class TestReplicaRouter:
+
+    @pytest.fixture(autouse=True)
+    def replica(self, settings):
+        settings.STORE_READ_REPLICAS = ["replica"]
+
+    def test_catalog_reads_in_safe_requests_go_to_a_replica(self):
+        _, routed = route(RequestFactory().get("/store/products/"))
+
+        assert routed == {"product": "replica", "cart": "default"}
+
+    def test_reads_while_writing_go_to_the_primary(self):
+        _, routed = route(RequestFactory().post("/store/products/"))
+
+        assert routed["product"] == "default"
+
+    def test_reads_outside_requests_go_to_the_primary(self):
+        assert Product.objects.all().db == "default"
+
+    def test_objects_read_from_a_replica_are_saved_to_the_primary(self):
+        product = Product(pk=1)
+        product._state.db = "replica"
+
+        assert router.db_for_write(Product, instance=product) == "default"
+
+    def test_writer_is_pinned_to_the_primary_by_cookie(self):
+        response, _ = route(RequestFactory().post("/store/carts/"))
+        cookie = response.cookies[replicas.PIN_COOKIE]
+        assert cookie["max-age"] == settings.STORE_REPLICA_PIN_SECONDS
+
+        request = RequestFactory().get("/store/products/")
+        request.COOKIES[replicas.PIN_COOKIE] = cookie.value
+        _, routed = route(request)
+
+        assert routed["product"] == "default"
+
+    def test_failed_writes_do_not_pin(self):
+        response, _ = route(RequestFactory().post("/store/carts/"), status=400)
+
+        assert replicas.PIN_COOKIE not in response.cookies
+
+    @mark.django_db
+    def test_writer_is_pinned_to_the_primary_by_user(self):
+        user = baker.make(settings.AUTH_USER_MODEL)
+        writing = RequestFactory().post("/store/carts/")
+        writing.user = user
+        route(writing)
+
+        reading = RequestFactory().get("/store/products/")
+        reading.user = user
+        _, routed = route(reading)
+
+        assert routed["product"] == "default"
+
+
+# Read before the primary_only fixture empties the setting for each test.
+CONFIGURED_REPLICAS = list(getattr(settings, "STORE_READ_REPLICAS", []))
+
+
+@pytest.fixture
+def replica(settings):
+    if not CONFIGURED_REPLICAS:
+        pytest.skip("Run with storefront.test_settings, which adds a replica.")
+    settings.STORE_READ_REPLICAS = CONFIGURED_REPLICAS
+    return CONFIGURED_REPLICAS[0]
+
+
+@mark.django_db(transaction=True, databases="__all__")
+class TestReplicaEndToEnd:
+
+    def test_product_list_reads_from_the_replica(self, api_client: APIClient, replica):
+        baker.make("store.Product")
+
+        with CaptureQueriesContext(connections[replica]) as context:
+            response = api_client.get(reverse("store:product-list"))
+
+        assert response.data["count"] == 1
+        assert any("store_product" in query["sql"] for query in context)
+
+    def test_client_reads_its_own_review_from_the_primary(
+        self, api_client: APIClient, replica
+    ):
+        product = baker.make("store.Product")
+        url = reverse("store:product-reviews-list", args=[product.id])
+        api_client.post(url, {"name": "Sam", "description": "Good.", "rating": 5})
+
+        with CaptureQueriesContext(connections[replica]) as context:
+            response = api_client.get(url)
+
+        assert response.data["count"] == 1
+        assert not context.captured_queries
+
+    def test_replica_reads_right_after_a_write_are_not_shared(
+        self, api_client: APIClient, replica
+    ):
+        baker.make("store.Product")
+        url = reverse("store:product-list")
+
+        response = api_client.get(url)
+
+        assert "ETag" not in response
+        assert "no-cache" in response["Cache-Control"]
+        with CaptureQueriesContext(connections[replica]) as context:
+            api_client.get(url)
+        assert context.captured_queries
+
+    def test_settled_replica_reads_are_cached(
+        self, api_client: APIClient, replica, monkeypatch
+    ):
+        baker.make("store.Product")
+        monkeypatch.setattr(replicas, "time", lambda: time() + 60)
+        url = reverse("store:product-list")
+
+        assert api_client.get(url)["ETag"]
+        with CaptureQueriesContext(connections[replica]) as context:
+            api_client.get(url)
+
+        assert not context.captured_queries
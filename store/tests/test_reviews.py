@@ -0,0 +1,137 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from model_bakery import baker
+from pytest import mark
+from store.models import Product, Review
+
+
+def post_review(api_client, product, rating):
+    return api_client.post(
+        reverse("store:product-reviews-list", args=[product.id]),
+        {"name": "Sam", "description": "Fits well.", "rating": rating},
+    )
+
+
+def ratings(product):
+    product.refresh_from_db()
+    return product.rating_count, product.average_rating
+
+
+@mark.django_db
+class TestReviews:
+
+    def test_if_rating_is_missing_returns_400(self, api_client: APIClient):
+        product = baker.make("store.Product")
+
+        response = api_client.post(
+            reverse("store:product-reviews-list", args=[product.id]),
+            {"name": "Sam", "description": "Fits well."},
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "rating" in response.data
+
+    def test_list_is_paginated_newest_first(self, api_client: APIClient):
+        product = baker.make("store.Product")
+        now = timezone.now()
+        for days in (3, 1, 2):
+            review = baker.make("store.Review", product=product, rating=4)
+            Review.objects.filter(pk=review.pk).update(date=now - timedelta(days=days))
+
+        response = api_client.get(
+            reverse("store:product-reviews-list", args=[product.id])
+        )
+
+        assert response.data["count"] == 3
+        dates = [review["date"] for review in response.data["results"]]
+        assert dates == sorted(dates, reverse=True)
+
+
+@mark.django_db
+class TestRatingAggregates:
+
+    def test_create_update_and_delete_adjust_aggregates(self, api_client: APIClient):
+        product = baker.make("store.Product")
+
+        first = post_review(api_client, product, 5).data["id"]
+        post_review(api_client, product, 2)
+        assert ratings(product) == (2, Decimal("3.50"))
+
+        api_client.patch(
+            reverse("store:product-reviews-detail", args=[product.id, first]),
+            {"rating": 3},
+        )
+        assert ratings(product) == (2, Decimal("2.50"))
+
+        api_client.delete(
+            reverse("store:product-reviews-detail", args=[product.id, first])
+        )
+        assert ratings(product) == (1, Decimal("2.00"))
+
+    def test_saving_a_loaded_product_keeps_concurrent_ratings(
+        self, api_client: APIClient
+    ):
+        product = baker.make("store.Product")
+        loaded = Product.objects.get(pk=product.pk)
+        post_review(api_client, product, 4)
+
+        loaded.title = "Renamed"
+        loaded.save()
+
+        assert ratings(product) == (1, Decimal("4.00"))
+        assert product.title == "Renamed"
+
+    def test_deleting_last_review_resets_average(self):
+        product = baker.make("store.Product")
+        review = baker.make("store.Review", product=product, rating=4)
+
+        review.delete()
+
+        assert ratings(product) == (0, Decimal("0.00"))
+
+    def test_unrated_reviews_are_not_counted(self):
+        product = baker.make("store.Product")
+        baker.make("store.Review", product=product, rating=None)
+        baker.make("store.Review", product=product, rating=3)
+
+        assert ratings(product) == (1, Decimal("3.00"))
+
+    def test_product_exposes_aggregates_without_extra_queries(
+        self, api_client: APIClient, django_assert_num_queries
+    ):
+        for product in baker.make("store.Product", _quantity=3):
+            baker.make("store.Review", product=product, rating=4, _quantity=2)
+
+        # Count, products page, images.
+        with django_assert_num_queries(3):
+            response = api_client.get(reverse("store:product-list"))
+
+        assert all(
+            (product["rating_count"], product["average_rating"]) == (2, Decimal("4.00"))
+            for product in response.data["results"]
+        )
+
+    def test_products_can_be_ordered_by_rating(self, api_client: APIClient):
+        good, bad = baker.make("store.Product", _quantity=2)
+        baker.make("store.Review", product=good, rating=5)
+        baker.make("store.Review", product=bad, rating=1)
+
+        response = api_client.get(
+            reverse("store:product-list"), {"ordering": "-average_rating"}
+        )
+
+        ids = [product["id"] for product in response.data["results"]]
+        assert ids == [good.id, bad.id]
+
+    def test_deleting_product_deletes_its_reviews(self):
+        product = baker.make("store.Product")
+        baker.make("store.Review", product=product, rating=5, _quantity=2)
+
+        product.delete()
+
+        assert not Product.objects.exists()
+        assert not Review.objects.exists()
@@ -0,0 +1,111 @@
+from hashlib import sha256
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .validators import MAX_FILE_SIZE
+
+# Room for the multipart boundaries and part headers around the file.
+MULTIPART_OVERHEAD = 64 * 1024
+
+SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+HEADER_SIZE = 12
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "File too large. Size should not exceed 2 MB."
+    default_code = "upload_too_large"
+
+
+class UnsupportedImageType(APIException):
+    status_code = status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+    default_detail = "Upload a JPEG, PNG, GIF or WebP image."
+    default_code = "unsupported_image_type"
+
+
+def sniff_image_type(header):
+    """Return the media type ``header`` starts with, or None."""
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp"
+    for signature, media_type in SIGNATURES:
+        if header.startswith(signature):
+            return media_type
+    return None
+
+
+class ImageUploadHandler(FileUploadHandler):
+    """
+    Receives the ``image`` part of a multipart upload chunk by chunk,
+    rejecting it as soon as it runs over the size limit or its first bytes
+    aren't a supported image, and hashing it on the way through.
+
+    The file is spooled in memory up to ``FILE_UPLOAD_MAX_MEMORY_SIZE`` and
+    on disk past that, bounded by the size limit either way. The resulting
+    upload carries its ``content_hash``.
+    """
+
+    field_name = "image"
+
+    def __init__(self, request=None, max_size=MAX_FILE_SIZE):
+        super().__init__(request)
+        self.max_size = max_size
+
+    def handle_raw_input(
+        self, input_data, META, content_length, boundary, encoding=None
+    ):
+        # Refuse a body that can't fit before reading any of it.
+        if content_length > self.max_size + MULTIPART_OVERHEAD:
+            raise UploadTooLarge()
+
+    def new_file(self, field_name, *args, **kwargs):
+        if field_name != self.field_name:
+            raise SkipFile()
+        super().new_file(field_name, *args, **kwargs)
+        self.size = 0
+        self.header = b""
+        self.digest = sha256()
+        self.file = SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE, suffix=".upload"
+        )
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        if self.size > self.max_size:
+            self.file.close()
+            raise UploadTooLarge()
+        if len(self.header) < HEADER_SIZE:
+            self.header += raw_data[: HEADER_SIZE - len(self.header)]
+            if len(self.header) == HEADER_SIZE:
+                self.check_type()
+        self.digest.update(raw_data)
+        self.file.write(raw_data)
+
+    def check_type(self):
+        self.media_type = sniff_image_type(self.header)
+        if self.media_type is None:
+            self.file.close()
+            raise UnsupportedImageType()
+
+    def file_complete(self, file_size):
+        self.check_type()
+        self.file.seek(0)
+        upload = UploadedFile(
+            file=self.file,
+            name=self.file_name,
+            content_type=self.media_type,
+            size=file_size,
+            charset=self.charset,
+            content_type_extra=self.content_type_extra,
+        )
+        upload.content_hash = self.digest.hexdigest()
+        return upload
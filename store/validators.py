@@ -1,7 +1,8 @@
 from django.core.exceptions import ValidationError
 
+MAX_FILE_SIZE = 2 * 1024 * 1024  # 2 MB
+
 
 def validate_file_size(value):
-    limit = 2 * 1024 * 1024  # 2 MB
-    if value.size > limit:
+    if value.size > MAX_FILE_SIZE:
         raise ValidationError("File too large. Size should not exceed 2 MB.")
@@ -1,12 +1,21 @@
-from django.db.models import Count
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date
 from django_filters.rest_framework import DjangoFilterBackend
 from django.shortcuts import get_object_or_404
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
-from rest_framework import status
+from rest_framework import generics, status
 from rest_framework.decorators import action
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.exceptions import ParseError, UnsupportedMediaType
 from rest_framework.mixins import (
     CreateModelMixin,
     RetrieveModelMixin,
@@ -15,9 +24,16 @@ from rest_framework.mixins import (
 )
 from rest_framework.viewsets import GenericViewSet
 
+from likes.models import LikedItem
+from store import cache, exports, imports, replicas
 from store.permissions import IsAdminOrReadOnly, ViewCustomerHistoryPermission
 
-from .filters import ProductFilter
+from .filters import (
+    OrderFilter,
+    ProductFilter,
+    ProductOrderingFilter,
+    ProductSearchFilter,
+)
 from .models import (
     Cart,
     CartItem,
@@ -29,9 +45,12 @@ from .models import (
     ProductImage,
     Review,
 )
-from .pagination import DefaultPagination
+from .pagination import DefaultPagination, ProductPagination
+from .renderers import CSVStreamRenderer, NDJSONStreamRenderer
+from .uploads import ImageUploadHandler
 from .serializers import (
     AddCartItemSerializer,
+    CartItemOperationSerializer,
     CartItemSerializer,
     CartSerializer,
     CreateOrderSerializer,
@@ -43,23 +62,170 @@ from .serializers import (
     ReviewSerializer,
     UpdateCartItemSerializer,
     UpdateOrderSerializer,
+    get_includes,
 )
 
 
-class ProductViewSet(ModelViewSet):
+class ConditionalGetMixin:
+    """
+    Answer reads with ETag and Last-Modified taken from the cache version
+    counters of the scopes a response depends on, and with 304 Not Modified
+    when the client's copy is current, before any query for the body runs.
+    """
+
+    cache_control = {}
+
+    def get_validator_scopes(self, request, *args, **kwargs):
+        return None
+
+    def get_cache_control(self):
+        overrides = getattr(settings, "STORE_CACHE_CONTROL", {})
+        return overrides.get(self.basename, self.cache_control)
+
+    def conditional_response(self, request, build, *args, **kwargs):
+        scopes = self.get_validator_scopes(request, *args, **kwargs)
+        if not scopes:
+            return build(request, *args, **kwargs)
+        etag, last_modified = cache.validators(request, *scopes)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = build(request, *args, **kwargs)
+            if not replicas.is_settled(request, scopes):
+                # Built from a replica that may not have the latest write
+                # yet; validators would let clients keep it as current.
+                patch_cache_control(response, no_cache=True)
+                return response
+        fresh = (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED)
+        if response.status_code in fresh:
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(last_modified)
+            patch_cache_control(response, **self.get_cache_control())
+        return response
+
+
+class ProductViewSet(ConditionalGetMixin, ModelViewSet):
     queryset = Product.objects.prefetch_related("images").all()
     serializer_class = ProductSerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, ProductSearchFilter, ProductOrderingFilter]
     filterset_class = ProductFilter
     permission_classes = [IsAdminOrReadOnly]
-    pagination_class = DefaultPagination
+    pagination_class = ProductPagination
     search_fields = ["title", "description"]
-    ordering_fields = ["unit_price", "last_update"]
+    ordering_fields = [
+        "unit_price",
+        "price_with_tax",
+        "effective_price",
+        "last_update",
+        "average_rating",
+        "rating_count",
+    ]
     ordering = ["unit_price"]
+    cache_control = {"public": True, "max_age": 60}
 
     def get_serializer_context(self):
         return {"request": self.request}
 
+    def get_validator_scopes(self, request, *args, **kwargs):
+        if "likes" in get_includes(request):
+            # Like counts move too often, and liked_by_me differs per user,
+            # for these responses to be cached or shared.
+            return None
+        if self.action == "list":
+            collection_id = request.query_params.get("collection_id", "")
+            if collection_id.isdigit():
+                return [(cache.COLLECTION, int(collection_id))]
+            return [(cache.CATALOG,)]
+        pk = str(kwargs["pk"])
+        if pk.isdigit():
+            return [(cache.PRODUCT, int(pk))]
+        return None
+
+    def conditional_response(self, request, build, *args, **kwargs):
+        response = super().conditional_response(request, build, *args, **kwargs)
+        if "likes" in get_includes(request):
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ["Authorization"])
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, self.cached_list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, self.cached_retrieve, *args, **kwargs)
+
+    def cached_list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def cached_retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, super().retrieve, *args, **kwargs)
+
+    def cached_response(self, request, build, *args, **kwargs):
+        scopes = self.get_validator_scopes(request, *args, **kwargs)
+        if not scopes:
+            return build(request, *args, **kwargs)
+        backend = cache.get_cache()
+        key = cache.response_key(request, *scopes)
+        data = backend.get(key)
+        if data is not None:
+            return Response(data)
+        response = build(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK and replicas.is_settled(
+            request, scopes
+        ):
+            backend.set(key, response.data, timeout=cache.get_timeout())
+        return response
+
+    @action(
+        detail=True,
+        methods=["post", "delete"],
+        permission_classes=[IsAuthenticated],
+    )
+    def like(self, request, pk=None):
+        """Like (POST) or unlike (DELETE) a product as the current user."""
+        product = generics.get_object_or_404(Product.objects.only("id"), pk=pk)
+        if request.method == "POST":
+            LikedItem.objects.like(request.user, product)
+        else:
+            LikedItem.objects.unlike(request.user, product)
+        counts = LikedItem.objects.get_like_counts(Product, [product.pk])
+        return Response(
+            {
+                "like_count": counts[product.pk],
+                "liked_by_me": request.method == "POST",
+            }
+        )
+
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="import",
+        permission_classes=[IsAdminUser],
+    )
+    def import_products(self, request):
+        """
+        Upsert products from a CSV (text/csv) or NDJSON
+        (application/x-ndjson) request body, read line by line. A body that
+        isn't UTF-8 gets a 400, though batches before the bad line are kept.
+        """
+        media_type = request.content_type.split(";")[0].strip()
+        formats = {
+            "text/csv": imports.FORMAT_CSV,
+            "application/x-ndjson": imports.FORMAT_NDJSON,
+        }
+        if media_type not in formats:
+            raise UnsupportedMediaType(media_type)
+        lines = imports.decode_lines(request.stream or [])
+        try:
+            report = imports.import_products(
+                imports.READERS[formats[media_type]](lines),
+                dry_run=request.query_params.get("dry_run") in ("1", "true"),
+            )
+        except UnicodeDecodeError:
+            raise ParseError("Request body is not valid UTF-8.")
+        return Response(report.as_dict())
+
     def destroy(self, request, *args, **kwargs):
         if OrderItem.objects.filter(product_id=kwargs["pk"]).exists():
             return Response(
@@ -71,10 +237,25 @@ class ProductViewSet(ModelViewSet):
         return super().destroy(request, *args, **kwargs)
 
 
-class CollectionViewSet(ModelViewSet):
-    queryset = Collection.objects.annotate(product_count=Count("products")).all()
+class CollectionViewSet(ConditionalGetMixin, ModelViewSet):
+    queryset = Collection.objects.all()
     serializer_class = CollectionSerializer
     permission_classes = [IsAdminOrReadOnly]
+    cache_control = {"public": True, "max_age": 60}
+
+    def get_validator_scopes(self, request, *args, **kwargs):
+        if self.action == "list":
+            return [(cache.CATALOG,)]
+        pk = str(kwargs["pk"])
+        if pk.isdigit():
+            return [(cache.COLLECTION, int(pk))]
+        return None
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().retrieve, *args, **kwargs)
 
     def get_serializer_context(self):
         return {"request": self.request}
@@ -92,23 +273,79 @@ class CollectionViewSet(ModelViewSet):
 
 class ReviewViewSet(ModelViewSet):
     serializer_class = ReviewSerializer
+    pagination_class = DefaultPagination
 
     def get_queryset(self):
-        return Review.objects.filter(product_id=self.kwargs["product_pk"])
+        return Review.objects.filter(product_id=self.kwargs["product_pk"]).order_by(
+            "-date", "-id"
+        )
+
+    # The product's rating aggregates are adjusted by signal handlers, in the
+    # same transaction as the review itself.
+    @transaction.atomic
+    def perform_create(self, serializer):
+        serializer.save()
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        serializer.save()
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
 
     def get_serializer_context(self):
         return {"request": self.request, "product_id": self.kwargs["product_pk"]}
 
 
 class CartViewSet(
-    CreateModelMixin, RetrieveModelMixin, DestroyModelMixin, GenericViewSet
+    ConditionalGetMixin,
+    CreateModelMixin,
+    RetrieveModelMixin,
+    DestroyModelMixin,
+    GenericViewSet,
 ):
     serializer_class = CartSerializer
-    queryset = Cart.objects.prefetch_related("items__product").all()
+    queryset = Cart.objects.with_totals()
+    cache_control = {"private": True, "no_cache": True}
 
     def get_serializer_context(self):
         return {"request": self.request}
 
+    def get_validator_scopes(self, request, *args, **kwargs):
+        try:
+            # Line prices come from the products, so their changes count too.
+            return cache.cart_scopes(kwargs["pk"])
+        except ValueError:
+            return None
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            (version,) = cache.get_versions(cache.cart_scope(kwargs["pk"]))
+        except ValueError:
+            return super().retrieve(request, *args, **kwargs)
+        response = self.conditional_response(request, super().retrieve, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.remember_cart_products(
+                kwargs["pk"],
+                version,
+                [item["product"]["id"] for item in response.data["items"]],
+            )
+            # Hand out the validators later requests will be checked
+            # against, now that the cart's products are known. A product
+            # written during the build is bumped again on commit, so these
+            # can't vouch for rows the body didn't see.
+            scopes = cache.cart_scopes(kwargs["pk"])
+            etag, last_modified = cache.validators(request, *scopes)
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    def perform_destroy(self, instance):
+        cart_id = instance.pk
+        instance.delete()
+        cache.forget_cart(cart_id)
+
 
 class CartItemViewSet(ModelViewSet):
 
@@ -116,18 +353,32 @@ class CartItemViewSet(ModelViewSet):
     def get_serializer_class(self):
         if self.action == "create":
             return AddCartItemSerializer
+        elif self.action == "bulk":
+            return CartItemOperationSerializer
         elif self.action == "update" or self.action == "partial_update":
             return UpdateCartItemSerializer
         return CartItemSerializer
 
     def get_queryset(self):
-        return CartItem.objects.filter(cart_id=self.kwargs["cart_pk"]).select_related(
-            "product"
-        )
+        return CartItem.objects.with_totals().filter(cart_id=self.kwargs["cart_pk"])
 
     def get_serializer_context(self):
         return {"cart_id": self.kwargs["cart_pk"]}
 
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        cache.bump_cart(self.kwargs["cart_pk"])
+
+    @action(detail=False, methods=["post"])
+    def bulk(self, request, cart_pk=None):
+        # DRF's version also answers 404 for a malformed UUID.
+        generics.get_object_or_404(Cart, pk=cart_pk)
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        cart = Cart.objects.with_totals().get(pk=cart_pk)
+        return Response(CartSerializer(cart).data)
+
 
 class CustomerViewSet(ModelViewSet):
     queryset = Customer.objects.all()
@@ -161,14 +412,34 @@ class CustomerViewSet(ModelViewSet):
 
 
 class OrderViewSet(ModelViewSet):
-    http_method_names = ["get", "patch", "delete", "head", "options"]
+    http_method_names = ["get", "post", "patch", "delete", "head", "options"]
     serializer_class = OrderSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = OrderFilter
+    pagination_class = DefaultPagination
 
     def get_permissions(self):
-        if self.request.method in ["PATCH", "DELETE"]:
+        if self.request.method in ["PATCH", "DELETE"] or self.action == "export":
             return [IsAdminUser()]
         return [IsAuthenticated()]
 
+    @action(
+        detail=False,
+        renderer_classes=[CSVStreamRenderer, NDJSONStreamRenderer],
+    )
+    def export(self, request):
+        orders = self.filter_queryset(Order.objects.all())
+        rows = exports.order_item_rows(orders)
+        if request.accepted_renderer.format == NDJSONStreamRenderer.format:
+            content, filename = exports.stream_ndjson(rows), "orders.ndjson"
+        else:
+            content, filename = exports.stream_csv(rows), "orders.csv"
+        response = StreamingHttpResponse(
+            content, content_type=request.accepted_renderer.media_type
+        )
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
     def create(self, request, *args, **kwargs):
         serializer = CreateOrderSerializer(
             data=request.data, context={"user": request.user}
@@ -180,9 +451,22 @@ class OrderViewSet(ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
+        items = OrderItem.objects.select_related("product").only(
+            "order",
+            "product__title",
+            "product__unit_price",
+            "product__effective_price",
+            "unit_price",
+            "quantity",
+        )
+        queryset = (
+            Order.objects.only("customer", "placed_at", "payment_status")
+            .prefetch_related(Prefetch("items", queryset=items))
+            .order_by("-placed_at", "-id")
+        )
         if user.is_staff:
-            return Order.objects.all()
-        return Order.objects.filter(customer__user=user)
+            return queryset
+        return queryset.filter(customer__user=user)
 
     def get_serializer_context(self):
         return {"user": self.request.user}
@@ -199,6 +483,11 @@ class ProductImageViewSet(ModelViewSet):
     serializer_class = ProductImageSerializer
     permission_classes = [IsAdminOrReadOnly]
 
+    def initialize_request(self, request, *args, **kwargs):
+        # Must be in place before anything reads the body.
+        request.upload_handlers = [ImageUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
+
     def get_queryset(self):
         return ProductImage.objects.filter(product_id=self.kwargs["product_pk"])
 
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'storefront.settings')
 
 application = get_asgi_application()
+
+# Without an outbox queue URL this process handles store events itself.
+from store.events import start_local_workers  # noqa: E402
+
+start_local_workers()
@@ -10,10 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+from copy import deepcopy
 from datetime import timedelta
 from pathlib import Path
 import os
 import environ
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -66,6 +68,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "store.replicas.ReplicaMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -105,17 +108,126 @@ WSGI_APPLICATION = "storefront.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+DB_CONN_HEALTH_CHECKS = env.bool("DB_CONN_HEALTH_CHECKS", default=True)
+# Abort any statement running longer than this many milliseconds (0 = off).
+DB_STATEMENT_TIMEOUT = env.int("DB_STATEMENT_TIMEOUT", default=0)
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
-        "NAME": "storefront3",
-        "USER": "postgres",
+        "NAME": env("DB_NAME", default="storefront3"),
+        "USER": env("DB_USER", default="postgres"),
         "PASSWORD": env("DB_PASSWORD"),
-        "HOST": "localhost",
-        "PORT": "5432",
+        "HOST": env("DB_HOST", default="localhost"),
+        "PORT": env("DB_PORT", default="5432"),
+        # Keep each worker's connection open across requests instead of
+        # reconnecting every time, and check it's still usable before reuse.
+        "CONN_MAX_AGE": env.int("DB_CONN_MAX_AGE", default=60),
+        "CONN_HEALTH_CHECKS": DB_CONN_HEALTH_CHECKS,
+        # Set when connecting through PgBouncer in transaction mode, which
+        # can't hold the server-side cursors used by .iterator().
+        "DISABLE_SERVER_SIDE_CURSORS": env.bool(
+            "DB_DISABLE_SERVER_SIDE_CURSORS", default=False
+        ),
+        "OPTIONS": {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT}"},
     }
 }
 
+# Share a pool of connections between the threads of each process instead of
+# one persistent connection per thread. Needs psycopg 3 with its pool
+# (`pip install "psycopg[binary,pool]"`) and replaces CONN_MAX_AGE.
+if env.bool("DB_POOL", default=False):
+    try:
+        import psycopg  # noqa: F401
+        from psycopg_pool import ConnectionPool
+    except ImportError:
+        raise ImproperlyConfigured(
+            "DB_POOL=1 needs psycopg 3 and its pool; psycopg2 can't pool "
+            'connections. Install them with pip install "psycopg[binary,pool]".'
+        )
+
+    DB_POOL_OPTIONS = {
+        "min_size": env.int("DB_POOL_MIN_SIZE", default=2),
+        "max_size": env.int("DB_POOL_MAX_SIZE", default=10),
+        "timeout": env.float("DB_POOL_TIMEOUT", default=10),
+        # Recycle connections so a long-lived pool doesn't pin server memory.
+        "max_lifetime": env.float("DB_POOL_MAX_LIFETIME", default=3600),
+    }
+    if DB_CONN_HEALTH_CHECKS:
+        DB_POOL_OPTIONS["check"] = ConnectionPool.check_connection
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+    DATABASES["default"]["OPTIONS"]["pool"] = DB_POOL_OPTIONS
+
+# Read replicas, one alias per host in DB_REPLICA_HOSTS (comma separated),
+# sharing the primary's other settings. Catalog reads in safe requests go to
+# a replica; a client that writes reads from the primary for the next
+# STORE_REPLICA_PIN_SECONDS so it sees its own writes. Tests run replicas
+# as mirrors of the primary.
+STORE_READ_REPLICAS = []
+for number, host in enumerate(env.list("DB_REPLICA_HOSTS", default=[]), start=1):
+    alias = f"replica_{number}"
+    DATABASES[alias] = {
+        **deepcopy(DATABASES["default"]),
+        "HOST": host,
+        "TEST": {"MIRROR": "default"},
+    }
+    STORE_READ_REPLICAS.append(alias)
+STORE_REPLICA_PIN_SECONDS = env.int("STORE_REPLICA_PIN_SECONDS", default=10)
+DATABASE_ROUTERS = ["store.replicas.ReplicaRouter"]
+
+# Response cache for the store catalog. Set REDIS_URL to share it across
+# workers; without it each process keeps a local-memory cache.
+REDIS_URL = env("REDIS_URL", default=None)
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+STORE_CACHE_ALIAS = "default"
+STORE_CACHE_TIMEOUT = env.int("STORE_CACHE_TIMEOUT", default=300)
+# Lifetime of the version counters behind ETags and cache keys; must be
+# longer than STORE_CACHE_TIMEOUT. Expired counters are re-seeded safely.
+STORE_CACHE_VERSION_TIMEOUT = env.int("STORE_CACHE_VERSION_TIMEOUT", default=86400)
+
+# Tax applied to products whose collection has no tax_rate of its own, as a
+# fraction of the unit price.
+STORE_DEFAULT_TAX_RATE = env("STORE_DEFAULT_TAX_RATE", default="0.20")
+
+# Image variants generated for each product image upload by the outbox
+# workers, as {name: {"size": [width, height], "format": Pillow format}}.
+# Defaults to a 150px thumbnail, a 600px medium JPEG and a 1200px WebP.
+# STORE_IMAGE_VARIANTS = {...}
+
+# Cache-Control directives per viewset basename, overriding the viewset's own
+# cache_control, e.g. {"product": {"public": True, "max_age": 300}}.
+STORE_CACHE_CONTROL = {}
+
+# Like counts are kept in the default cache, moved on each like and unlike,
+# and reloaded from the table when they expire. Run
+# `python manage.py reconcile_like_counts` periodically to correct drift.
+LIKES_COUNT_TIMEOUT = env.int("LIKES_COUNT_TIMEOUT", default=3600)
+
+# Outbox for store events such as order_created. Without a queue URL the
+# web process (started through storefront.wsgi or storefront.asgi) handles
+# events on its own worker threads. Setting one, which may be the same Redis
+# as REDIS_URL, hands them to `python manage.py run_outbox_worker`, which
+# must then run alongside the web process.
+STORE_OUTBOX_QUEUE_URL = env("STORE_OUTBOX_QUEUE_URL", default=None)
+STORE_OUTBOX_WORKERS = env.int("STORE_OUTBOX_WORKERS", default=2)
+STORE_OUTBOX_MAX_ATTEMPTS = 5
+STORE_OUTBOX_RETRY_DELAY = 30  # seconds, doubled after each failed attempt
+STORE_OUTBOX_LEASE = 300  # seconds a worker holds an event before it is retried
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -0,0 +1,12 @@
+"""
+Settings for the test suite: the project settings plus, unless
+DB_REPLICA_HOSTS already adds some, a read replica that mirrors the primary
+test database, so replica routing is exercised end to end.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES, STORE_READ_REPLICAS
+
+if not STORE_READ_REPLICAS:
+    DATABASES["replica_1"] = {**DATABASES["default"], "TEST": {"MIRROR": "default"}}
+    STORE_READ_REPLICAS = ["replica_1"]
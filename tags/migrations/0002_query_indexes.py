@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("tags", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="taggeditem",
+            index=models.Index(
+                fields=["content_type", "object_id"], name="tags_taggeditem_object_idx"
+            ),
+        ),
+    ]
@@ -1,8 +1,36 @@
+from collections import defaultdict
+from hashlib import sha256
+from time import time_ns
+from django.conf import settings
+from django.core.cache import caches
 from django.db import models
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 
 
+def get_cache():
+    # Shares the store's alias so tag lookups move and flush with it.
+    return caches[getattr(settings, 'STORE_CACHE_ALIAS', 'default')]
+
+
+def _version_key(content_type_id):
+    return f'tags:v:{content_type_id}'
+
+
+def bump_content_types(content_type_ids):
+    """
+    Invalidate the cached object ids of every tag on the given content
+    types.
+    """
+    cache = get_cache()
+    for content_type_id in set(content_type_ids):
+        key = _version_key(content_type_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time_ns(), timeout=None)
+
+
 class TaggedItemManager(models.Manager):
     def get_tags_for(self, obj_type, obj_id):
         content_type = ContentType.objects.get_for_model(obj_type)
@@ -14,6 +42,52 @@ class TaggedItemManager(models.Manager):
                 object_id=obj_id
             )
 
+    def get_tags_for_objects(self, obj_type, obj_ids):
+        """
+        Return the tags of many objects of one type, fetched in a single
+        query, as {object_id: [Tag, ...]} ordered by label.
+        """
+        content_type = ContentType.objects.get_for_model(obj_type)
+
+        items = TaggedItem.objects \
+            .select_related('tag') \
+            .filter(
+                content_type=content_type,
+                object_id__in=obj_ids
+            ) \
+            .order_by('tag__label', 'tag_id')
+        tags = defaultdict(list)
+        for item in items:
+            tags[item.object_id].append(item.tag)
+        return tags
+
+    def get_object_ids_for(self, obj_type, label):
+        """
+        Return the ids of the objects of one type tagged with ``label``.
+        Cached until a tag or tagged item of that type changes.
+        """
+        content_type = ContentType.objects.get_for_model(obj_type)
+        cache = get_cache()
+        version_key = _version_key(content_type.pk)
+        version = cache.get(version_key)
+        if version is None:
+            cache.add(version_key, time_ns(), timeout=None)
+            version = cache.get(version_key)
+        digest = sha256(label.encode('utf-8')).hexdigest()
+        key = f'tags:objects:{content_type.pk}:{version}:{digest}'
+
+        object_ids = cache.get(key)
+        if object_ids is None:
+            object_ids = list(
+                TaggedItem.objects
+                .filter(content_type=content_type, tag__label=label)
+                .values_list('object_id', flat=True)
+                .distinct()
+            )
+            timeout = getattr(settings, 'TAGS_CACHE_TIMEOUT', 300)
+            cache.set(key, object_ids, timeout=timeout)
+        return object_ids
+
 
 class Tag(models.Model):
     label = models.CharField(max_length=255)
@@ -28,3 +102,11 @@ class TaggedItem(models.Model):
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
     object_id = models.PositiveIntegerField()
     content_object = GenericForeignKey()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['content_type', 'object_id'],
+                name='tags_taggeditem_object_idx'
+            ),
+        ]
@@ -0,0 +1,30 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from tags.models import Tag, TaggedItem, bump_content_types
+
+
+@receiver(post_save, sender=TaggedItem)
+@receiver(post_delete, sender=TaggedItem)
+def invalidate_tagged_item(sender, instance, **kwargs):
+    bump_content_types([instance.content_type_id])
+
+
+@receiver(pre_save, sender=Tag)
+def remember_previous_label(sender, instance, raw=False, **kwargs):
+    instance._previous_label = instance.label
+    if instance.pk and not raw:
+        instance._previous_label = Tag.objects \
+            .filter(pk=instance.pk) \
+            .values_list('label', flat=True) \
+            .first()
+
+
+@receiver(post_save, sender=Tag)
+def invalidate_renamed_tag(sender, instance, created, **kwargs):
+    if created or instance.label == instance._previous_label:
+        return
+    bump_content_types(
+        TaggedItem.objects
+        .filter(tag=instance)
+        .values_list('content_type_id', flat=True)
+    )